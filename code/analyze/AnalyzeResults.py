@@ -1,56 +1,77 @@
 #!/usr/bin/python3
 import argparse
-import multiprocessing as mp
 import pickle
 import os
+import numpy as np
 
 import matplotlib as mpl
 mpl.rcParams.update({'font.size': 14})
 mpl.use('Agg')
 
+def lambda_times(entry):
+    """ (run_time, warm_time) of a `lambdas` value: (kind, mem, run, warm) in the supplied traces, (mem, run, warm) from TraceGen """
+    return entry[-2], entry[-1]
+
+
+def count_matrices(runs):
+    """
+    Hit/miss counts of many results as runs x functions matrices.
+    runs - list of (lambdas, miss_stats)
+    Returns (kinds, hits, misses, run_time, warm_time), all runs x functions except kinds: column j is kinds[j],
+    functions a run never invoked count zero. Times are per run, traces may reuse kind names with other times
+    """
+    kinds = sorted(set().union(*[msd.keys() for lambdas, msd in runs]))
+    col = {k: j for j, k in enumerate(kinds)}
+    hits = np.zeros((len(runs), len(kinds)), dtype=np.int64)
+    misses = np.zeros((len(runs), len(kinds)), dtype=np.int64)
+    run_time = np.zeros((len(runs), len(kinds)))
+    warm_time = np.zeros((len(runs), len(kinds)))
+    for r, (lambdas, msd) in enumerate(runs):
+        for k, v in msd.items():
+            j = col[k]
+            hits[r, j] = v["hits"]
+            misses[r, j] = v["misses"]
+            run_time[r, j], warm_time[r, j] = lambda_times(lambdas[k])
+    return kinds, hits, misses, run_time, warm_time
+
+
+def analyze_counts(hits, misses, run_time, warm_time):
+    """
+    `analyze_timings` for a runs x functions grid of counts in one go.
+    Per-function metrics are runs x functions arrays, global ones have one entry per run
+    """
+    accesses = hits + misses
+    invoked = accesses > 0
+    saved = run_time - warm_time
+    # Effective access time
+    eat = np.divide(misses*run_time + hits*saved, accesses, out=np.zeros(accesses.shape), where=invoked)
+    pct_incr = np.divide(warm_time*misses, accesses*saved, out=np.zeros(accesses.shape), where=invoked & (saved != 0))
+
+    total_accesses = accesses.sum(axis=1)
+    return {"accesses": accesses, "eat": eat, "pct_incr_vs_all_hits": pct_incr,
+            "server_cold": misses.sum(axis=1) / total_accesses,
+            "wted_eat": (eat*accesses).sum(axis=1) / total_accesses,
+            "wted_increase": (pct_incr*accesses).sum(axis=1) / total_accesses}
+
+
 def analyze_timings(policy, lambdas, msd):
     """ Effective access time, etc. """
-    total_cold = []
-    avg_latencies = []
-    pct_increases = []
+    kinds, hits, misses, run_time, warm_time = count_matrices([(lambdas, msd)])
+    anal = analyze_counts(hits, misses, run_time, warm_time)
+
     out_dict = dict()  # BAD: We'll insert some global and some per-key stats
     out_dict["global"] = dict()
-    out_dict["global"]["server_cold"] = 0
-    total_accesses = 0  # for computing weighted averages
-
-    for k in sorted(msd.keys()):
+    out_dict["global"]["server_cold"] = float(anal["server_cold"][0])
+    out_dict["global"]["wted_eat"] = float(anal["wted_eat"][0])
+    out_dict["global"]["wted_increase"] = float(anal["wted_increase"][0])
+    for j, k in enumerate(kinds):
         out_dict[k] = dict()
-        misses = msd[k]['misses']
-        hits = msd[k]['hits']
-
-        out_dict[k]["misses"] = misses
-        out_dict[k]["hits"] = hits
-        out_dict[k]["accesses"] = misses+hits
-        total_accesses += out_dict[k]["accesses"]
-
-        twarm = lambdas[k][3]
-        trun = lambdas[k][2]
-
-        out_dict[k]["total_cold"] = misses
-        out_dict["global"]["server_cold"] += out_dict[k]["total_cold"]
-        #Effective acccess time
-        out_dict[k]["eat"] = (
-            (misses*trun) + (hits*(trun-twarm)))/(misses+hits)
-
-        if trun-twarm == 0:
-            pct_incr = 0
-        else:
-            pct_incr = twarm*misses/((misses+hits)*(trun-twarm))
-        out_dict[k]["pct_incr_vs_all_hits"] = pct_incr
-    #
-    out_dict["global"]["server_cold"] = out_dict["global"]["server_cold"]/total_accesses
-
-    out_dict["global"]["wted_eat"] = sum([out_dict[k]["eat"]*out_dict[k]["accesses"]/total_accesses
-                                          for k in msd.keys()])
-
-    out_dict["global"]["wted_increase"] = sum([out_dict[k]["pct_incr_vs_all_hits"]*out_dict[k]["accesses"]/total_accesses
-                                               for k in msd.keys()])
-
+        out_dict[k]["misses"] = int(misses[0, j])
+        out_dict[k]["hits"] = int(hits[0, j])
+        out_dict[k]["accesses"] = int(anal["accesses"][0, j])
+        out_dict[k]["total_cold"] = int(misses[0, j])
+        out_dict[k]["eat"] = float(anal["eat"][0, j])
+        out_dict[k]["pct_incr_vs_all_hits"] = float(anal["pct_incr_vs_all_hits"][0, j])
     return out_dict
 
 
@@ -64,30 +85,12 @@ def load_data(path):
         return pickle.load(f)
 
 
-def compute_timings(file):
-    pth = os.path.join(data_path, file)
-    policy, num_funcs, mem, run = get_info_from_file(file)
-    policy, evdict, miss_stats, lambdas, capacity_misses, len_trace = load_data(pth)
-    anal = analyze_timings(policy, lambdas, miss_stats)
-
-    total_misses = sum(capacity_misses.values())
-
-    name = "{}-{}-{}-{}.pckl".format(policy, num_funcs, mem, run)
-    # capacity_misses: dict[func_name] = invocations_not_handled
-    # len_trace: long
-    data = (policy, anal, capacity_misses, len_trace)
-   
-    cold_pct = anal["global"]["server_cold"]
-    dropped_pct = (total_misses / len_trace) * 100
-    print(name, "Cold starts %:", cold_pct*100, "; Dropped %:", dropped_pct)
-
-
 def compute_all(data_path):
-    with mp.Pool() as pool:
-        files = [file for file in os.listdir(
-            data_path) if os.path.isfile(os.path.join(data_path, file))]
-        print("computing {} files".format(len(files)))
-        pool.map(compute_timings, files)
+    # SummaryStore imports count_matrices and analyze_counts from this module, so it is imported here rather than at the top
+    from SummaryStore import update_summary
+    table = update_summary(data_path)
+    for name, cold_pct, dropped_pct in zip(table["result"], table["cold_pct"], table["dropped_pct"]):
+        print(name, "Cold starts %:", cold_pct, "; Dropped %:", dropped_pct)
 
 
 if __name__ == "__main__":
@@ -95,5 +98,4 @@ if __name__ == "__main__":
     parser.add_argument("--pckldir", type=str,
                         default="/data/alfuerst/verify-test/", required=False)
     args = parser.parse_args()
-    data_path = args.pckldir
     compute_all(args.pckldir)
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""
+Miss-ratio curve of size-aware LRU keep-alive in one pass over a trace.
+
+Every function is one cached object of `mem_size` MB, and an invocation is a warm start at every memory size
+at least its LRU stack distance (see `StackDistance.LRUStackDistance`). One pass gives the cold-start %
+at every memory size, the curve `PlotResults.plot_run` draws for the simulated `LRU` policy.
+For huge traces, `--rate` < 1 enables SHARDS-style spatial sampling: only functions whose hashed kind falls
+under the sampling threshold are tracked, and their distances are scaled up by 1/rate.
+"""
+import argparse
+import os
+import pickle
+import sys
+import zlib
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../sim'))
+from StackDistance import LRUStackDistance
+from ColumnarTrace import load_columnar, columnar_name
+from SummaryStore import update_summary, select
+
+import matplotlib as mpl
+mpl.rcParams.update({'font.size': 14})
+mpl.use('Agg')
+import matplotlib.pyplot as plt
+
+SHARDS_MODULUS = 1 << 24
+
+def sampled(kind, rate):
+    """ Spatial sampling decision, stable across runs and processes unlike `hash()` """
+    return zlib.crc32(str(kind).encode()) % SHARDS_MODULUS < rate * SHARDS_MODULUS
+
+def stack_distances(trace, rate=1.0):
+    """
+    LRU stack distance in MB of each (sampled) invocation of a (LambdaData, time) iterable,
+    np.inf for first accesses. Distances are scaled by 1/rate when sampling.
+    """
+    sd = LRUStackDistance([])
+    dists = []
+    keep = dict()  # kind : sampled?
+    for d, t in trace:
+        s = keep.get(d.kind)
+        if s is None:
+            s = keep[d.kind] = rate >= 1.0 or sampled(d.kind, rate)
+        if not s:
+            continue
+        dist = sd.distance(d)
+        dists.append(np.inf if dist is None else dist)
+    dists = np.array(dists, dtype=np.float64)
+    if rate < 1.0:
+        dists /= rate
+    return dists
+
+def miss_ratio_curve(dists, mems):
+    """ Cold-start % at each memory size in `mems` from the stack distances of a trace """
+    if len(dists) == 0:
+        return [(mem, 0.0) for mem in mems]
+    srt = np.sort(dists)
+    # hits at `mem` are the accesses with distance <= mem
+    hits = np.searchsorted(srt, np.asarray(mems, dtype=np.float64), side="right")
+    cold_pct = (len(srt) - hits) / len(srt) * 100
+    return list(zip(mems, cold_pct.tolist()))
+
+def load_trace_iter(num_functions, char, trace_path):
+    """ (lambdas, iterable of (LambdaData, time)), preferring a columnar copy of the trace """
+    columnar = load_columnar(os.path.join(trace_path, columnar_name(num_functions, char)))
+    if columnar is not None:
+        lambdas, funcs, func_ids, times = columnar
+        return lambdas, ((funcs[fid], t) for fid, t in zip(func_ids.tolist(), times.tolist()))
+    with open(os.path.join(trace_path, "{}-{}.pckl".format(num_functions, char)), "r+b") as f:
+        return pickle.load(f)
+
+def simulated_curve(pckldir, policy, num_funcs, char):
+    """ (mem, cold %) points of simulated results, as plotted by PlotResults """
+    table = select(update_summary(pckldir), policy, num_funcs, char)
+    return list(zip(table["mem"].tolist(), table["cold_pct"].tolist()))
+
+def plot_mrc(curve, save_path, sim=None, label="LRU"):
+    fig, ax = plt.subplots()
+    fig.set_size_inches(5,3)
+
+    ax.plot([mem/1024 for mem, pct in curve], [pct for mem, pct in curve], color="blue", label="Stack distance")
+    if sim:
+        ax.plot([mem/1024 for mem, pct in sim], [pct for mem, pct in sim], color="red", marker="o", linestyle="", label="Simulated " + label)
+        ax.legend()
+
+    ax.set_ylabel("% Cold Starts")
+    ax.set_ylim((0,None))
+    ax.set_xlabel("System Memory (GB)")
+
+    plt.savefig(save_path, bbox_inches="tight")
+    plt.close(fig)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='One-pass LRU miss-ratio curve of a FaasCache trace')
+    parser.add_argument("--tracedir", type=str, default="../traces/", required=False)
+    parser.add_argument("--numfuncs", type=int, default=20, required=False)
+    parser.add_argument("--char", type=str, default="a", required=False)
+    parser.add_argument("--rate", type=float, default=1.0, required=False, help="SHARDS sampling rate, 1.0 is exact")
+    parser.add_argument("--mem", action='append', help="memory sizes to report, defaults to 50 points up to the total function memory")
+    parser.add_argument("--pckldir", type=str, default=None, required=False, help="overlay simulated results from this directory")
+    parser.add_argument("--policy", type=str, default="LRU", required=False, help="simulated policy to overlay")
+    parser.add_argument("--plotdir", type=str, default="../figs/", required=False)
+    args = parser.parse_args()
+
+    lambdas, trace = load_trace_iter(args.numfuncs, args.char, args.tracedir)
+    dists = stack_distances(trace, args.rate)
+    if args.mem:
+        mems = sorted(int(mem) for mem in args.mem)
+    else:
+        total = sum(v[-3] for v in lambdas.values())  # mem_size, whether the tuples carry the kind or not
+        mems = np.linspace(0, total, 51)[1:].astype(int).tolist()
+    curve = miss_ratio_curve(dists, mems)
+    for mem, pct in curve:
+        print(mem, "Cold starts %:", pct)
+
+    sim = simulated_curve(args.pckldir, args.policy, args.numfuncs, args.char) if args.pckldir else None
+    if not os.path.exists(args.plotdir):
+        os.mkdir(args.plotdir)
+    plot_mrc(curve, os.path.join(args.plotdir, "mrc-{}-{}.png".format(args.numfuncs, args.char)), sim, args.policy)
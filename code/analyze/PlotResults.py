@@ -1,6 +1,6 @@
 #!/usr/bin/python3
-from AnalyzeResults import analyze_timings
-import pickle
+from SummaryStore import update_summary, select
+import numpy as np
 import os
 import matplotlib.ticker as mticker
 
@@ -41,40 +41,45 @@ def plot_run(results, save_path):
     plt.savefig(save_path, bbox_inches="tight")
     plt.close(fig)
 
-def get_info_from_file(filename):
-    policy, num_funcs, mem, run = filename[:-5].split("-")
-    return policy, int(num_funcs), int(mem), run
+def plot_telemetry(npz_path, save_path):
+    """ Time series of one run, as saved by `--telemetry` next to its result pickle """
+    with np.load(npz_path) as f:
+        data = {name: f[name] for name in f.files}
+    hours = data["time"] / (3600 * 1000)
+    per_min = 60 * 1000 / float(data["interval"])
+
+    fig, axes = plt.subplots(3, 1, sharex=True)
+    fig.set_size_inches(6,6)
+
+    axes[0].plot(hours, data["mem_used"] / 1024, color="blue")
+    axes[0].set_ylabel("Memory (GB)")
+    axes[0].set_ylim((0,None))
+
+    axes[1].plot(hours, data["pool"], color="blue", label="Pool")
+    axes[1].plot(hours, data["running"], color="green", label="Running")
+    axes[1].set_ylabel("Containers")
+    axes[1].set_ylim((0,None))
+    axes[1].legend(fontsize=10)
+
+    # The last row may cover a partial interval, so rates are only approximate there
+    axes[2].plot(hours, data["misses"] * per_min, color="blue", label="Cold starts")
+    axes[2].plot(hours, data["evictions"] * per_min, color="red", label="Evictions")
+    axes[2].plot(hours, data["dropped"] * per_min, color="black", label="Dropped")
+    if "expired" in data and data["expired"].any():
+        # Only keep-alive policies expire containers
+        axes[2].plot(hours, data["expired"] * per_min, color="orange", label="Expired")
+    axes[2].set_ylabel("Per minute")
+    axes[2].set_ylim((0,None))
+    axes[2].legend(fontsize=10)
+    axes[2].set_xlabel("Time (hours)")
 
-def load_data(path):
-    with open(path, "r+b") as f:
-        return pickle.load(f)
+    plt.savefig(save_path, bbox_inches="tight")
+    plt.close(fig)
 
 def plot_all(args):
-    results = []
-    num_funcs = args.numfuncs
-    filt = "{}-{}-".format(args.policy, num_funcs)
-    char_filt = "-{}.pckl".format(args.char)
-    for file in os.listdir(args.pckldir):
-        if filt in file and char_filt in file:
-            policy, num_funcs, mem, run = get_info_from_file(file)
-            pth = os.path.join(args.pckldir, file)
-            policy, evdict, miss_stats, lambdas, capacity_misses, len_trace = load_data(pth)
-
-            data = analyze_timings(policy, lambdas, miss_stats)
-            total_misses = sum(capacity_misses.values())
-            total_cold = 0
-            total_warm = 0
-            for func in data.keys():
-              if func != "global":
-                total_warm += data[func]["hits"]
-                total_cold += data[func]["misses"]
-            print(data["global"], total_misses, total_warm, total_cold, len_trace)
-
-            cold_pct = data["global"]["server_cold"] *100
-            dropped_pct = (total_misses / len_trace) * 100
-            # print(file, "Cold starts %:", cold_pct, "; Dropped %:", dropped_pct)
-            results.append((mem, cold_pct, dropped_pct))
-    save_path = os.path.join(args.plotdir, "results-{}-{}-{}.png".format(args.policy, num_funcs, args.char))
+    table = select(update_summary(args.pckldir), args.policy, args.numfuncs, args.char)
+    results = list(zip(table["mem"].tolist(), table["cold_pct"].tolist(), table["dropped_pct"].tolist()))
+    save_path = os.path.join(args.plotdir, "results-{}-{}-{}.png".format(args.policy, args.numfuncs, args.char))
     plot_run(results, save_path)
 
 if __name__ == "__main__":
@@ -84,10 +89,18 @@ if __name__ == "__main__":
     parser.add_argument("--numfuncs", type=int, default=20, required=False)
     parser.add_argument("--char", type=str, default="a", required=False)
     parser.add_argument("--policy", type=str, default="RAND", required=False)
+    parser.add_argument("--telemetry", type=str, default=None, action='append',
+                        help="plot this <result>.telemetry.npz time series instead of the memory sweep")
 
     args = parser.parse_args()
 
     if not os.path.exists(args.plotdir):
       os.mkdir(args.plotdir)
 
-    plot_all(args)
+    if args.telemetry is not None:
+      for npz_path in args.telemetry:
+        save_path = os.path.join(args.plotdir, os.path.basename(npz_path)[:-len(".npz")] + ".png")
+        plot_telemetry(npz_path, save_path)
+        print("wrote", save_path)
+    else:
+      plot_all(args)
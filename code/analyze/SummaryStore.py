@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""
+Incremental summary table of a results directory.
+
+`update_summary` keeps one row per result pickle, keyed by policy, numfuncs, mem and char, as columns in
+`<pckldir>/summary.npz`, with p50/p99 response times for results that carry a latency histogram.
+A result file is only unpickled and analyzed again if its mtime or size changed and the sha1 of its contents
+no longer matches; files that disappeared are dropped from the table.
+Changed files are loaded on a process pool and analyzed together in one batched `analyze_counts` call.
+Reporting and plotting then read only the table.
+"""
+import argparse
+import hashlib
+import multiprocessing as mp
+import os
+import sys
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../sim'))
+from LatencyHistogram import LatencyHistogram
+from AnalyzeResults import count_matrices, analyze_counts, get_info_from_file, load_data
+
+SUMMARY_NAME = "summary.npz"
+# Bumped whenever rows would be computed differently, tables of another version are rebuilt
+SUMMARY_VERSION = 2
+
+# (column, dtype) of the summary table
+COLUMNS = [("result", np.str_), ("policy", np.str_), ("numfuncs", np.int64), ("mem", np.int64), ("char", np.str_),
+           ("cold_pct", np.float64), ("dropped_pct", np.float64), ("wted_eat", np.float64), ("wted_increase", np.float64),
+           ("hits", np.int64), ("misses", np.int64), ("dropped", np.int64), ("len_trace", np.int64),
+           ("p50_ms", np.float64), ("p99_ms", np.float64),
+           ("mtime_ns", np.int64), ("size", np.int64), ("sha1", np.str_)]
+COLUMN_NAMES = [name for name, dtype in COLUMNS]
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_result(job):
+    """
+    Counts of a changed result file for `summarize`, or None if its contents still hash to `old_sha1`.
+    Only the `lambdas` entries of invoked functions are kept, to keep what goes back to the parent small
+    """
+    path, mtime_ns, size, old_sha1 = job
+    sha1 = file_hash(path)
+    if sha1 == old_sha1:
+        return None
+    policy, num_funcs, mem, char = get_info_from_file(os.path.basename(path))
+    data = load_data(path)
+    policy, evdict, miss_stats, lambdas, capacity_misses, len_trace = data[:6]
+    lambdas = {k: lambdas[k] for k in miss_stats}
+    key = (os.path.basename(path), policy, num_funcs, mem, char)
+    p50 = p99 = np.nan
+    if len(data) > 6 and data[6] is not None:
+        h = LatencyHistogram.from_dict(data[6])
+        p50, p99 = h.quantile(0.5), h.quantile(0.99)
+    return key, lambdas, miss_stats, sum(capacity_misses.values()), len_trace, (p50, p99), mtime_ns, size, sha1
+
+def summarize(loaded):
+    """ Summary rows of loaded results, analyzed in one batched `analyze_counts` call """
+    kinds, hits, misses, run_time, warm_time = count_matrices([(lambdas, msd) for key, lambdas, msd, *rest in loaded])
+    anal = analyze_counts(hits, misses, run_time, warm_time)
+    rows = []
+    for r, (key, lambdas, msd, dropped, len_trace, latency, mtime_ns, size, sha1) in enumerate(loaded):
+        rows.append(key + (anal["server_cold"][r] * 100, dropped / len_trace * 100, anal["wted_eat"][r], anal["wted_increase"][r],
+                           hits[r].sum(), misses[r].sum(), dropped, len_trace) + latency + (mtime_ns, size, sha1))
+    return rows
+
+def empty_table():
+    return {name: np.array([], dtype=dtype) for name, dtype in COLUMNS}
+
+def load_summary(summary_path):
+    """ The summary table as a dict of column arrays, empty if there is none """
+    if not os.path.exists(summary_path):
+        return empty_table()
+    with np.load(summary_path) as f:
+        if any(name not in f.files for name in COLUMN_NAMES):
+            # Written before a column was added, rebuilt from scratch
+            return empty_table()
+        if "version" not in f.files or int(f["version"]) != SUMMARY_VERSION:
+            return empty_table()
+        return {name: f[name] for name, dtype in COLUMNS}
+
+def save_summary(summary_path, table):
+    tmp = summary_path + ".tmp"
+    with open(tmp, "w+b") as f:
+        np.savez(f, version=SUMMARY_VERSION, **table)
+    os.replace(tmp, summary_path)
+
+def update_summary(pckldir, summary_path=None, workers=None):
+    """ Bring the summary table of `pckldir` up to date and return it, sorted by policy, numfuncs, char and mem """
+    if summary_path is None:
+        summary_path = os.path.join(pckldir, SUMMARY_NAME)
+    old = load_summary(summary_path)
+    old_rows = {name: i for i, name in enumerate(old["result"].tolist())}
+
+    keep = []       # rows of `old` that are still current
+    touched = []    # (row of `old`, mtime_ns, size) for files to re-hash
+    jobs = []
+    for entry in os.scandir(pckldir):
+        if not entry.is_file() or not entry.name.endswith(".pckl"):
+            continue
+        st = entry.stat()
+        i = old_rows.get(entry.name)
+        if i is not None and old["mtime_ns"][i] == st.st_mtime_ns and old["size"][i] == st.st_size:
+            keep.append(i)
+            continue
+        touched.append((i, st.st_mtime_ns, st.st_size))
+        jobs.append((entry.path, st.st_mtime_ns, st.st_size, None if i is None else old["sha1"][i]))
+
+    if len(jobs) == 0 and len(keep) == len(old["result"]):
+        return old
+
+    rows = []
+    if len(jobs) > 0:
+        print("analyzing {} of {} result files".format(len(jobs), len(jobs) + len(keep)))
+        if len(jobs) == 1:
+            results = [load_result(jobs[0])]
+        else:
+            with mp.Pool(workers) as pool:
+                results = pool.map(load_result, jobs)
+        loaded = []
+        for (i, mtime_ns, size), result in zip(touched, results):
+            if result is None:
+                # Same contents, only the stat changed
+                row = [old[name][i] for name, dtype in COLUMNS]
+                row[COLUMN_NAMES.index("mtime_ns")] = mtime_ns
+                row[COLUMN_NAMES.index("size")] = size
+                rows.append(row)
+            else:
+                loaded.append(result)
+        if len(loaded) > 0:
+            rows += summarize(loaded)
+
+    table = dict()
+    for col, (name, dtype) in enumerate(COLUMNS):
+        fresh = np.array([row[col] for row in rows], dtype=dtype)
+        table[name] = np.concatenate((old[name][keep], fresh)).astype(dtype)
+    order = np.lexsort((table["mem"], table["char"], table["numfuncs"], table["policy"]))
+    table = {name: column[order] for name, column in table.items()}
+    save_summary(summary_path, table)
+    return table
+
+def select(table, policy=None, numfuncs=None, char=None):
+    """ Rows of `table` matching the given keys, still sorted by mem within each group """
+    mask = np.ones(len(table["result"]), dtype=bool)
+    if policy is not None:
+        mask &= table["policy"] == policy
+    if numfuncs is not None:
+        mask &= table["numfuncs"] == numfuncs
+    if char is not None:
+        mask &= table["char"] == char
+    return {name: column[mask] for name, column in table.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='update the summary table of FaasCache results')
+    parser.add_argument("--pckldir", type=str, default="/data/alfuerst/verify-test/", required=False)
+    parser.add_argument("--workers", type=int, default=None, required=False)
+    args = parser.parse_args()
+    table = update_summary(args.pckldir, workers=args.workers)
+    print(len(table["result"]), "results in", os.path.join(args.pckldir, SUMMARY_NAME))
@@ -0,0 +1,45 @@
+import os
+import pickle
+import random
+import time
+
+class Checkpointer:
+    """
+    Periodically saves a `LambdaScheduler` together with its offset into the trace.
+    A checkpoint is due every `every` invocations or `seconds` of wall-clock time, whichever comes first.
+    Files are written to a temporary name and renamed, so a crash mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, path, every:int=1000000, seconds:float=600):
+        self.path = path
+        self.every = every
+        self.seconds = seconds
+        self.last_offset = 0
+        self.last_time = time.time()
+
+    def due(self, offset):
+        return offset - self.last_offset >= self.every or time.time() - self.last_time >= self.seconds
+
+    def save(self, sched, offset):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w+b") as f:
+            # RAND draws from the module-level generator, its state is part of the simulation
+            pickle.dump((offset, random.getstate(), sched), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self.last_offset = offset
+        self.last_time = time.time()
+
+    def load(self):
+        """ Return (sched, offset) restored from the checkpoint, or None if there is none """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r+b") as f:
+            offset, rand_state, sched = pickle.load(f)
+        random.setstate(rand_state)
+        self.last_offset = offset
+        self.last_time = time.time()
+        return sched, offset
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+"""
+Columnar on-disk trace format.
+
+A trace `<num_functions>-<char>.pckl` converts to the directory `<num_functions>-<char>.trace/` holding
+  functions.pckl - (lambdas, funcs): the `lambdas` dict of the original trace and the function table,
+                   a list of `LambdaData` indexed by function id
+  func_ids.npy   - int32 function id of every invocation
+  times.npy      - float64 time of every invocation
+
+The arrays are opened with `np.load(mmap_mode="r")`, so every pool worker maps the same pages
+instead of unpickling its own copy of the trace.
+"""
+import argparse
+import os
+import pickle
+import numpy as np
+from LambdaData import *
+from FunctionTable import *
+
+def columnar_name(num_functions, char):
+    return "{}-{}.trace".format(num_functions, char)
+
+def to_columns(trace):
+    """ Intern the `LambdaData` of a (LambdaData, time) trace to dense ids, in order of first appearance """
+    table = FunctionTable()
+    func_ids = np.empty(len(trace), dtype=np.int32)
+    times = np.empty(len(trace), dtype=np.float64)
+    for i, (d, t) in enumerate(trace):
+        func_ids[i] = table.intern(d).func_id
+        times[i] = t
+    return table.funcs, func_ids, times
+
+def save_functions(out_dir, lambdas, funcs):
+    """ Write functions.pckl through a temporary file, so it only exists once it is complete """
+    tmp = os.path.join(out_dir, "functions.pckl.tmp")
+    with open(tmp, "w+b") as f:
+        pickle.dump((lambdas, funcs), f)
+    os.replace(tmp, os.path.join(out_dir, "functions.pckl"))
+
+def save_columnar(out_dir, lambdas, funcs, func_ids, times):
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    np.save(os.path.join(out_dir, "func_ids.npy"), func_ids)
+    np.save(os.path.join(out_dir, "times.npy"), times)
+    # Written last, a directory without it is an interrupted conversion
+    save_functions(out_dir, lambdas, funcs)
+
+def load_columnar(trace_dir, mmap=True):
+    """ Return (lambdas, funcs, func_ids, times), or None if `trace_dir` is not a complete columnar trace """
+    table = os.path.join(trace_dir, "functions.pckl")
+    if not os.path.exists(table):
+        return None
+    with open(table, "r+b") as f:
+        lambdas, funcs = pickle.load(f)
+    # Conversions made before LambdaData carried func_id
+    funcs = FunctionTable.from_funcs(funcs).funcs
+    mode = "r" if mmap else None
+    func_ids = np.load(os.path.join(trace_dir, "func_ids.npy"), mmap_mode=mode)
+    times = np.load(os.path.join(trace_dir, "times.npy"), mmap_mode=mode)
+    return lambdas, funcs, func_ids, times
+
+def convert(pckl_path, out_dir):
+    with open(pckl_path, "r+b") as f:
+        lambdas, trace = pickle.load(f)
+    funcs, func_ids, times = to_columns(trace)
+    save_columnar(out_dir, lambdas, funcs, func_ids, times)
+    return len(trace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert pickled FaasCache traces to the columnar format')
+    parser.add_argument("--tracedir", type=str, default="../traces/", required=False)
+    parser.add_argument("--outdir", type=str, default=None, required=False, help="defaults to --tracedir")
+    parser.add_argument("--force", action="store_true", help="re-convert traces that already have a columnar copy")
+    args = parser.parse_args()
+    outdir = args.outdir if args.outdir is not None else args.tracedir
+
+    for file in sorted(os.listdir(args.tracedir)):
+        if not file.endswith(".pckl"):
+            continue
+        out_dir = os.path.join(outdir, file[:-5] + ".trace")
+        if os.path.exists(os.path.join(out_dir, "functions.pckl")) and not args.force:
+            print("exists", out_dir)
+            continue
+        n = convert(os.path.join(args.tracedir, file), out_dir)
+        print("converted", file, n, "invocations")
@@ -1,27 +1,39 @@
 from LambdaData import LambdaData
 
 class Container:
-    
-    state = "COLD"
+
+    # Container states, small ints instead of strings
+    COLD = 0
+    WARM = 1
+    RUNNING = 2
+    TERM = 3
+
+    # Fixed attribute layout, thousands of these are alive in large pools
+    __slots__ = ("metadata", "func_id", "state", "invoke_freq", "priority", "init_time", "pool_seq", "last_used", "expires")
     
     def __init__(self, lamdata: LambdaData):
         self.metadata = lamdata
+        self.func_id = lamdata.func_id
+        self.state = Container.COLD
         self.invoke_freq = 1
         self.priority = 0
         self.init_time = lamdata.run_time - lamdata.warm_time
+        self.pool_seq = 0
+        self.last_used = 0
+        self.expires = None     # time its pending TTL expiry fires, see LambdaScheduler.ScheduleExpiry
         
     def prewarm(self):
-        self.state = "WARM"
+        self.state = Container.WARM
     
     def cfree(self):
-        return self.state == "WARM" or self.state == "COLD"
+        return self.state == Container.WARM or self.state == Container.COLD
     
     def run(self):
         #returns the time when finished? 
-        self.state = "RUNNING"
+        self.state = Container.RUNNING
         
     def terminate(self):
-        self.state = "TERM"
+        self.state = Container.TERM
     
     def __repr__(self):
         return str(self.metadata.kind)
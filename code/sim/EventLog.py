@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""
+Buffered binary log of scheduler events.
+
+Records are fixed width (see `EVENT_DTYPE`) and written a block at a time.
+Functions are stored as small integer ids, the id -> kind table goes to `<path>.kinds` when the log is closed.
+"""
+import argparse
+import pickle
+import numpy as np
+
+EVENT_DTYPE = np.dtype([("func", "<i4"), ("time", "<f8"), ("event", "u1")])
+EVENTS = ["miss", "hit", "evict", "drop", "expire"]   # event code is the index in this list
+EVENT_CODES = {e: i for i, e in enumerate(EVENTS)}
+
+class EventLog:
+
+    def __init__(self, path, block:int=8192):
+        self.path = path
+        self.f = open(path, "w+b")
+        self.buf = np.empty(block, dtype=EVENT_DTYPE)
+        self.n = 0
+        self.kinds = []
+        self.kind_ids = dict()  # kind : id
+
+    def write(self, kind, time, event):
+        """ Append one `event` (a name in `EVENTS`) for function `kind` """
+        fid = self.kind_ids.get(kind)
+        if fid is None:
+            fid = self.kind_ids[kind] = len(self.kinds)
+            self.kinds.append(kind)
+        self.buf[self.n] = (fid, time, EVENT_CODES[event])
+        self.n += 1
+        if self.n == len(self.buf):
+            self.flush()
+
+    def flush(self):
+        self.buf[:self.n].tofile(self.f)
+        self.n = 0
+        self.f.flush()
+
+    def __getstate__(self):
+        # Checkpointed with the scheduler: flush and remember how much of the file is valid
+        self.flush()
+        state = self.__dict__.copy()
+        state["offset"] = self.f.tell()
+        del state["f"]
+        return state
+
+    def __setstate__(self, state):
+        offset = state.pop("offset")
+        self.__dict__.update(state)
+        # Drop anything written after the checkpoint
+        self.f = open(self.path, "r+b")
+        self.f.truncate(offset)
+        self.f.seek(offset)
+
+    def close(self):
+        self.flush()
+        self.f.close()
+        with open(self.path + ".kinds", "w+b") as f:
+            pickle.dump(self.kinds, f)
+
+def read_event_log(path):
+    """ Return (kinds, records), `records["func"]` indexes into `kinds` and `records["event"]` into `EVENTS` """
+    with open(path + ".kinds", "r+b") as f:
+        kinds = pickle.load(f)
+    return kinds, np.fromfile(path, dtype=EVENT_DTYPE)
+
+def event_counts(path):
+    """ dict[kind] = {event name: count} from a closed event log """
+    kinds, records = read_event_log(path)
+    counts = np.zeros((len(kinds), len(EVENTS)), dtype=np.int64)
+    np.add.at(counts, (records["func"], records["event"]), 1)
+    return {k: dict(zip(EVENTS, counts[i].tolist())) for i, k in enumerate(kinds)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarize a FaasCache event log')
+    parser.add_argument("log", type=str)
+    args = parser.parse_args()
+    for kind, counts in event_counts(args.log).items():
+        print(kind, counts)
@@ -0,0 +1,47 @@
+from heapq import heappush, heappop, heapify
+from Container import *
+
+class EvictionHeap:
+    """
+    Min-heap over the non-running containers of the pool, keyed on `key(container)`.
+    Ties are broken in favour of the most recently pooled container, which is the
+    same victim order a stable descending sort of `ContainerPool` followed by `pop()` gives.
+
+    Entries are invalidated lazily: `discard` only forgets the live entry for a container,
+    stale tuples are skipped when they reach the top of the heap.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.heap = []      # (key, -pool_seq, Container)
+        self.entries = {}   # Container : its live heap entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, c: Container):
+        """ `c` became available for eviction, index it with its current key """
+        entry = (self.key(c), -c.pool_seq, c)
+        self.entries[c] = entry
+        heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.compact()
+
+    def discard(self, c: Container):
+        """ `c` started running or left the pool """
+        self.entries.pop(c, None)
+
+    def pop(self):
+        """ Remove and return the container with the smallest key, None if empty """
+        while len(self.heap) > 0:
+            entry = heappop(self.heap)
+            c = entry[2]
+            if self.entries.get(c) is entry:
+                del self.entries[c]
+                return c
+        return None
+
+    def compact(self):
+        """ Drop stale entries so the heap stays proportional to the idle pool """
+        self.heap = list(self.entries.values())
+        heapify(self.heap)
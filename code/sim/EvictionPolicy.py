@@ -0,0 +1,314 @@
+import random
+from functools import partial
+from operator import attrgetter
+from Container import *
+from EvictionHeap import *
+from SizeBuckets import *
+from LFUGroupEngine import *
+
+POLICIES = dict()  # policy name : callable(LambdaScheduler) -> EvictionPolicy
+
+def register_policy(name, factory=None):
+    """
+    Register an eviction policy under `name`, the string passed to `LambdaScheduler(policy=...)`.
+    `factory` is called with the scheduler and returns an `EvictionPolicy`.
+    Without `factory` this returns a class decorator.
+    """
+    def register(factory):
+        if name in POLICIES:
+            raise Exception("Eviction policy '{}' is already registered".format(name))
+        POLICIES[name] = factory
+        return factory
+
+    if factory is None:
+        return register
+    return register(factory)
+
+def check_policy(name):
+    """ Raise if no eviction policy is registered under `name` """
+    if name not in POLICIES:
+        raise NotImplementedError("Unknown eviction policy: {}".format(name))
+
+class EvictionPolicy:
+    """
+    Base class for eviction policies. The scheduler calls the hooks as containers change state,
+    every hook is a no-op here so a policy only pays for the bookkeeping it needs.
+
+    on_hit(c) - `c` was found warm and launched, `invoke_freq` already counts this invocation
+    on_miss(c) - `c` was created and launched cold, `invoke_freq` already counts this invocation
+    on_start(c) - `c` started running and can no longer be evicted
+    on_finish(c) - `c` finished running and can be evicted again
+    on_evict(c) - `c` was removed from the ContainerPool
+    select_victims(to_free) - return a list of non-running containers to evict
+    rebuild() - index the containers of a scheduler this policy takes over mid-run
+    ttl(c) - keep-alive policies only: ms an idle `c` is kept before it expires on its own
+
+    Policies with `keep_alive` set have the scheduler call `ttl` whenever a container goes idle and schedule
+    its expiry, see `LambdaScheduler.ScheduleExpiry`. All others never expire containers.
+    """
+
+    keep_alive = False
+
+    def __init__(self, sched):
+        self.sched = sched
+
+    def on_hit(self, c: Container):
+        pass
+
+    def on_miss(self, c: Container):
+        pass
+
+    def on_start(self, c: Container):
+        pass
+
+    def on_finish(self, c: Container):
+        pass
+
+    def on_evict(self, c: Container):
+        pass
+
+    def select_victims(self, to_free):
+        raise NotImplementedError("{} does not implement select_victims".format(type(self).__name__))
+
+    def rebuild(self):
+        """ Take over a scheduler mid-run, see `LambdaScheduler.fork` """
+        pass
+
+    def ttl(self, c: Container):
+        return float("inf")
+
+class IndexedPolicy(EvictionPolicy):
+    """
+    Policy that keeps its own index over the non-running containers.
+    `index` must support push(c), discard(c) and len()
+    """
+
+    def __init__(self, sched, index):
+        super().__init__(sched)
+        self.index = index
+
+    def on_start(self, c: Container):
+        self.index.discard(c)
+
+    def on_finish(self, c: Container):
+        # keys were updated when `c` was launched, index it with the new ones
+        self.index.push(c)
+
+    def on_evict(self, c: Container):
+        self.index.discard(c)
+
+    def rebuild(self):
+        for c in self.sched.ContainerPool:
+            if c.state == Container.WARM:
+                self.index.push(c)
+
+############################################################
+
+@register_policy("RAND")
+class RandomPolicy(EvictionPolicy):
+    """ Simple eviction that randomly chooses from non-running containers """
+
+    def select_victims(self, to_free):
+        eviction_list = []
+        # XXX Can't evict running containers!
+        # Even with infinite concurrency, container will still exist in running_c
+        available = [c for c in self.sched.ContainerPool if c not in self.sched.RunningC]
+
+        while to_free > 0 and len(available) > 0:
+            victim = random.choice(available)
+            available.remove(victim)
+            eviction_list.append(victim)
+            to_free -= victim.metadata.mem_size
+
+        return eviction_list
+
+@register_policy("CLOSEST_SIZE_LARGEST_KICK")
+class ClosestSizeLargestKickPolicy(IndexedPolicy):
+    """ Naive approach. Evict a container with a size closest to `to_free`.
+    If `to_free` is greater than max mem size of largest container, then kick out largest container
+
+    The index keeps the non-running containers bucketed by size, so no sort is needed here.
+    This policy is not dependent on warm/cold run time of the function.
+    """
+
+    def __init__(self, sched):
+        super().__init__(sched, SizeBuckets())
+
+    def select_victims(self, to_free):
+        eviction_list = []
+
+        while to_free > 0 and len(self.index) > 0:
+            victim = self.index.pop_closest(to_free)
+            eviction_list.append(victim)
+            to_free -= victim.metadata.mem_size
+
+        return eviction_list
+
+@register_policy("CLOSEST_SIZE_SMALLEST_KICK")
+class ClosestSizeSmallestKickPolicy(IndexedPolicy):
+    """ Naive approach. Evict a container with a size closest to `to_free`.
+    If `to_free` is greater than max mem size of largest container, then kick out smallest container
+
+    The index keeps the non-running containers bucketed by size, so no sort is needed here.
+    This policy is not dependent on warm/cold run time of the function.
+    """
+
+    def __init__(self, sched):
+        super().__init__(sched, SizeBuckets())
+
+    def select_victims(self, to_free):
+        eviction_list = []
+
+        while to_free > 0 and len(self.index) > 0:
+            if to_free > self.index.max_size():
+                victim = self.index.pop_smallest()
+            else:
+                victim = self.index.pop_closest(to_free)
+
+            eviction_list.append(victim)
+            to_free -= victim.metadata.mem_size
+
+        return eviction_list
+
+class HeapPolicy(IndexedPolicy):
+    """ Evict the non-running containers with the smallest `key` first. `key` must pickle, so no lambdas """
+
+    def __init__(self, sched, key):
+        super().__init__(sched, EvictionHeap(key=key))
+
+    def select_victims(self, to_free):
+        eviction_list = []
+
+        while to_free > 0 and len(self.index) > 0:
+            victim = self.index.pop() # O(log n)
+            eviction_list.append(victim)
+            to_free -= victim.metadata.mem_size
+
+        return eviction_list
+
+@register_policy("LRU")
+class LRUPolicy(HeapPolicy):
+    """ Evict the least recently used/invoked container """
+
+    def __init__(self, sched):
+        super().__init__(sched, key=attrgetter("last_used"))
+
+    def on_hit(self, c: Container):
+        # Invocation counter orders launches even within the same wall_time
+        c.last_used = self.sched.num_invocations
+
+    on_miss = on_hit
+
+@register_policy("LFU_CLASSIC")
+class LFUPolicy(HeapPolicy):
+    """ Evict the least frequently invoked container """
+
+    def __init__(self, sched):
+        super().__init__(sched, key=attrgetter("invoke_freq"))
+
+@register_policy("DUAL_GREEDY_PRIORITY")
+class DualGreedyPolicy(HeapPolicy):
+    """ Greedy-Dual keep-alive from the FaaSCache paper (cited in the report), lowest priority goes first """
+
+    def __init__(self, sched):
+        super().__init__(sched, key=attrgetter("priority"))
+
+    def on_hit(self, c: Container):
+        c.priority = self.sched.wall_time + (c.init_time * c.invoke_freq / c.metadata.mem_size)
+
+    on_miss = on_hit
+
+class LFUGroupPolicy(IndexedPolicy):
+    """
+    LFU_GROUP_* family: take a group of the least frequently invoked containers,
+    optionally narrow it to a subgroup, and pick the victim from it.
+    The per-policy choices are declared in `LFU_GROUP_SPECS`, `LFUGroupEngine` runs them.
+    """
+
+    def __init__(self, sched, spec: GroupSpec):
+        super().__init__(sched, LFUGroupEngine(spec))
+
+    def select_victims(self, to_free):
+        return self.index.select(to_free)
+
+for name, spec in LFU_GROUP_SPECS.items():
+    register_policy(name, partial(LFUGroupPolicy, spec=spec))
+
+############################################################
+# Keep-alive policies: idle containers also expire on their own after a TTL
+
+@register_policy("TTL_FIXED")
+class FixedTTLPolicy(LRUPolicy):
+    """
+    Provider-style keep-alive: every idle container expires after the scheduler's `ttl` ms, 10 minutes
+    unless set. LRU picks victims when memory runs out before then. With an infinite TTL this is `LRU`
+    """
+
+    keep_alive = True
+    DEFAULT_TTL = 10 * 60 * 1000
+
+    def __init__(self, sched):
+        super().__init__(sched)
+        self.default_ttl = sched.ttl if sched.ttl is not None else self.DEFAULT_TTL
+
+    def ttl(self, c: Container):
+        return self.default_ttl
+
+@register_policy("TTL_ADAPTIVE")
+class AdaptiveTTLPolicy(FixedTTLPolicy):
+    """
+    Per-function keep-alive, after the histogram policy of "Serverless in the Wild" (Shahrad et al., ATC '20).
+    Each function's inter-arrival times go into 1-minute bins up to 4 hours, and its containers are kept for the
+    99th percentile of them plus a 10% margin. A function keeps the fixed TTL until it has `MIN_SAMPLES`
+    inter-arrival samples, and whenever more than 1% of its inter-arrival times exceed 4 hours, since the
+    99th percentile then lies past the histogram
+    """
+
+    BIN = 60 * 1000
+    BINS = 240
+    PERCENTILE = 0.99
+    MARGIN = 1.1
+    MIN_SAMPLES = 10    # inter-arrival samples, i.e. arrivals after the first
+    REFRESH = 64    # arrivals between recomputing a function's TTL
+
+    def __init__(self, sched):
+        super().__init__(sched)
+        self.last_arrival = dict()  # func_id : time of its last served invocation
+        self.iats = dict()          # func_id : inter-arrival counts per bin, the last one past the range
+        self.pending = dict()       # func_id : arrivals since its TTL was computed
+        self.ttls = dict()          # func_id : current TTL
+
+    def on_hit(self, c: Container):
+        super().on_hit(c)
+        k = c.func_id
+        t = self.sched.wall_time
+        last = self.last_arrival.get(k)
+        self.last_arrival[k] = t
+        if last is None:
+            return
+        hist = self.iats.get(k)
+        if hist is None:
+            hist = self.iats[k] = [0] * (self.BINS + 1)
+            self.pending[k] = 0
+        hist[min(int((t - last) // self.BIN), self.BINS)] += 1
+        self.pending[k] += 1
+        if self.pending[k] >= self.REFRESH or (k not in self.ttls and self.pending[k] >= self.MIN_SAMPLES):
+            self.ttls[k] = self.histogram_ttl(hist)
+            self.pending[k] = 0
+
+    on_miss = on_hit
+
+    def histogram_ttl(self, hist):
+        total = sum(hist)
+        if hist[self.BINS] > total * (1 - self.PERCENTILE):
+            return self.default_ttl
+        need = self.PERCENTILE * total
+        seen = 0
+        for b, count in enumerate(hist):
+            seen += count
+            if seen >= need:
+                return (b + 1) * self.BIN * self.MARGIN
+        return self.default_ttl
+
+    def ttl(self, c: Container):
+        return self.ttls.get(c.func_id, self.default_ttl)
@@ -0,0 +1,52 @@
+from LambdaData import *
+
+class FunctionTable:
+    """
+    Interns `LambdaData` to one shared object per function kind, numbered with dense ids in order of
+    first appearance. `func_id` then indexes `funcs` or any per-function NumPy array.
+    """
+
+    def __init__(self):
+        self.funcs = []         # func_id : LambdaData
+        self.ids = dict()       # kind : func_id
+
+    def __len__(self):
+        return len(self.funcs)
+
+    def intern(self, d: LambdaData):
+        """ Return the shared `LambdaData` for `d.kind`, registering `d` as it if the kind is new """
+        fid = self.ids.get(d.kind)
+        if fid is None:
+            fid = self.ids[d.kind] = len(self.funcs)
+            d.func_id = fid
+            self.funcs.append(d)
+        return self.funcs[fid]
+
+    def intern_trace(self, trace):
+        """ Intern a list of (LambdaData, time) in place, returns it """
+        for i, (d, t) in enumerate(trace):
+            shared = self.intern(d)
+            if shared is not d:
+                trace[i] = (shared, t)
+        return trace
+
+    def number(self, d: LambdaData):
+        """ Give `d` the id of its kind, registering the kind if it is new, without replacing `d` by the shared object """
+        fid = self.ids.get(d.kind)
+        if fid is None:
+            fid = self.ids[d.kind] = len(self.funcs)
+            self.funcs.append(d)
+        d.func_id = fid
+        return fid
+
+    @classmethod
+    def from_funcs(cls, funcs):
+        """ Table over an existing id-ordered function list, e.g. the one stored with a columnar trace """
+        table = cls()
+        for d in funcs:
+            table.intern(d)
+        return table
+
+# Ids for `LambdaData` that reach a scheduler without having been interned, e.g. traces built by a script.
+# One table per process, so every scheduler numbers such a function the same way
+UNINTERNED = FunctionTable()
@@ -0,0 +1,168 @@
+import numpy as np
+from Container import *
+
+def group_size(n, frac, min_n, default):
+    """ Size of a candidate group drawn from `n` idle containers """
+    return int(frac * n) if n > min_n else default
+
+def lower_bound(sizes, key):
+    """
+    Binary search for the closest size: the first index whose size is >= `key` in a sorted array,
+    the last index if every size is smaller
+    """
+    start = 0
+    end = len(sizes) - 1
+    while start < end:
+        mid = start + (end - start) // 2
+        if key > sizes[mid]:
+            start = mid + 1
+        else:
+            end = mid
+    return end
+
+class GroupSpec:
+    """
+    Declares one LFU_GROUP_* policy on top of `LFUGroupEngine`.
+
+    group - (frac, min_n, default) sizing of the LFU group taken from the least frequently invoked containers
+    subgroup - the same sizing for the second-level group, None if the policy picks straight from the LFU group
+    narrow - (how, field) shrinking the LFU group to the subgroup:
+             "least" keeps the subgroup with the smallest `field`,
+             "closest" keeps the `field`-sorted tail starting at the closest size, at least `subgroup` long
+    pick - (how, field) choosing the victim among the candidates:
+           "min"/"max" take the smallest/largest `field`, "closest" the closest size after sorting by `field`,
+           "closest_unsorted" binary searches the candidates in frequency order without sorting them first
+    """
+
+    def __init__(self, group, pick, subgroup=None, narrow=None):
+        self.group = group
+        self.subgroup = subgroup
+        self.narrow = narrow
+        self.pick = pick
+
+LFU_GROUP_SPECS = {
+    "LFU_GROUP_CLOSEST":
+        GroupSpec(group=(0.1, 40, 4), pick=("closest_unsorted", "mem_size")),
+    "LFU_GROUP_MAX_COLD_TIME":
+        GroupSpec(group=(0.1, 40, 4), pick=("max", "run_time")),
+    "LFU_GROUP_MAX_INIT_TIME":
+        GroupSpec(group=(0.1, 40, 4), pick=("min", "init_time")),
+    "LFUGROUP_MAXINITGROUP_CLOSEST":
+        GroupSpec(group=(0.1, 40, 4), subgroup=(0.05, 40, 2), narrow=("least", "init_time"), pick=("closest", "mem_size")),
+    "LFUGROUP_CLOSESTGROUP_MAXINIT":
+        GroupSpec(group=(0.1, 60, 6), subgroup=(0.05, 60, 3), narrow=("closest", "mem_size"), pick=("min", "init_time")),
+    "LFUGROUP_MAXINITGROUP_LARGEST":
+        GroupSpec(group=(0.1, 40, 4), subgroup=(0.05, 40, 2), narrow=("least", "init_time"), pick=("max", "mem_size")),
+}
+
+class LFUGroupEngine:
+    """
+    Candidate selection shared by the LFU_GROUP_* policies.
+    Non-running containers live in slots of structure-of-arrays NumPy columns, so an eviction orders
+    the idle pool with one `lexsort` and scores each group with array ops instead of Python sorts.
+    Ties resolve exactly like the stable sorts of `ContainerPool` the policies were written against.
+    """
+
+    fields = ("invoke_freq", "mem_size", "init_time", "run_time")
+
+    def __init__(self, spec: GroupSpec, capacity:int=1024):
+        self.spec = spec
+        self.cols = {f: np.zeros(capacity) for f in self.fields}
+        self.cols["pool_seq"] = np.zeros(capacity, dtype=np.int64)
+        self.containers = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+        self.slots = dict()  # Container : slot
+
+    def __len__(self):
+        return len(self.slots)
+
+    def grow(self):
+        capacity = len(self.containers)
+        for f, col in self.cols.items():
+            self.cols[f] = np.concatenate((col, np.zeros_like(col)))
+        self.containers.extend([None] * capacity)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def push(self, c: Container):
+        """ `c` became available for eviction, snapshot its keys """
+        if len(self.free) == 0:
+            self.grow()
+        slot = self.free.pop()
+        self.slots[c] = slot
+        self.containers[slot] = c
+        cols = self.cols
+        cols["invoke_freq"][slot] = c.invoke_freq
+        cols["mem_size"][slot] = c.metadata.mem_size
+        cols["init_time"][slot] = c.init_time
+        cols["run_time"][slot] = c.metadata.run_time
+        cols["pool_seq"][slot] = c.pool_seq
+
+    def discard(self, c: Container):
+        """ `c` started running or left the pool """
+        slot = self.slots.pop(c, None)
+        if slot is not None:
+            self.containers[slot] = None
+            self.free.append(slot)
+
+    # -------- Stages --------
+
+    def stable_order(self, cand, field):
+        return cand[np.argsort(self.cols[field][cand], kind="stable")]
+
+    def narrow(self, cand, m, to_free):
+        how, field = self.spec.narrow
+        if how == "least":
+            return self.stable_order(cand, field)[:m]
+        # "closest"
+        srt = self.stable_order(cand, field)
+        if m >= len(cand):
+            # The whole group, still in `field` order so the pick breaks ties the same way
+            return srt
+        start = min(lower_bound(self.cols[field][srt], to_free), len(srt) - m)
+        return srt[start:]
+
+    def pick(self, cand, to_free):
+        how, field = self.spec.pick
+        if how == "min":
+            # argmin/argmax return the first occurrence, i.e. the earliest candidate on ties
+            return cand[np.argmin(self.cols[field][cand])]
+        if how == "max":
+            # latest candidate on ties, like popping the end of an ascending stable sort
+            return cand[len(cand) - 1 - np.argmax(self.cols[field][cand][::-1])]
+        if how == "closest":
+            cand = self.stable_order(cand, field)
+        return cand[lower_bound(self.cols[field][cand], to_free)]
+
+    def select(self, to_free):
+        """ Return victim list freeing at least `to_free`, removing the victims from the engine """
+        idle = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+        n = len(idle)
+        # Ascending invoke_freq, least invoked at the start, pool order on ties
+        order = idle[np.lexsort((self.cols["pool_seq"][idle], self.cols["invoke_freq"][idle]))]
+
+        spec = self.spec
+        g = group_size(n, *spec.group)
+        m = group_size(n, *spec.subgroup) if spec.subgroup is not None else 0
+
+        # `group` is always the first `g` survivors of `order`
+        group = list(order[:g])
+        nxt = len(group)
+        eviction_list = []
+        while to_free > 0 and len(group) > 0:
+            cand = np.array(group, dtype=np.int64)
+            if spec.narrow is not None:
+                cand = self.narrow(cand, m, to_free)
+            slot = self.pick(cand, to_free)
+
+            group.remove(slot)
+            if nxt < n:
+                group.append(order[nxt])
+                nxt += 1
+
+            victim = self.containers[slot]
+            eviction_list.append(victim)
+            to_free -= victim.metadata.mem_size
+
+        for victim in eviction_list:
+            self.discard(victim)
+        return eviction_list
@@ -1,4 +1,9 @@
 class LambdaData:
+
+    # Dense id assigned by `FunctionTable` when a trace is loaded, None if the object was never interned.
+    # A class attribute so LambdaData unpickled from existing traces, which lack it, still work
+    func_id = None
+
     def __init__ (self, kind, mem_size, run_time, warm_time):
         """
         kind - unique identifier for function
@@ -12,8 +17,18 @@ class LambdaData:
         self.warm_time = warm_time
         
     def __eq__(self, other):
+        if self is other:
+            # Interned by `FunctionTable`, one object per function
+            return True
         if isinstance(other, LambdaData):
             return self.kind == other.kind 
+
+    def __hash__(self):
+        return hash(self.kind)
+
+    def __deepcopy__(self, memo):
+        # Shared between copies of a scheduler, like the trace that references it
+        return self
         
     def __repr__(self):
         return str((self.kind, self.mem_size))
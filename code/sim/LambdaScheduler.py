@@ -1,89 +1,112 @@
 import numpy as np
 import random
-from collections import defaultdict
 from LambdaData import *
+from FunctionTable import UNINTERNED
 from Container import *
+from EvictionPolicy import *
+from EventLog import EventLog
+from Profiler import Profiler
+from LatencyHistogram import LatencyHistogram
+from Telemetry import Telemetry
 import os
-from heapq import heappush, heappop
+import copy
+from heapq import heappush, heappop, heapify
 
 class LambdaScheduler:
 
-    def __init__(self, policy:str="RAND", mem_capacity:int=32000, num_funcs:int=10, run:str="a", log_dir=""):
+    # Timed events in EventHeap, a finish sorts before an expiry at the same time
+    FINISH = 0
+    EXPIRE = 1
+
+    def __init__(self, policy:str="RAND", mem_capacity:int=32000, num_funcs:int=10, run:str="a", log_dir="",
+                 validate:str="full", validate_every:int=1000, event_log:bool=False, profile:bool=False,
+                 telemetry_interval=None, telemetry_intervals:int=1024, ttl=None):
         fname = "{}-{}-{}-{}-".format(policy, num_funcs, mem_capacity, run)
 
         self.mem_capacity = mem_capacity
         self.mem_used = 0
+        self.FuncMemUsed = []           # func_id : memory held by that function's containers
+
+        # How often runInvocation calls AssertMemory
+        # "full" = every invocation, "sampled" = every `validate_every` invocations, "off" = never
+        if validate not in ("off", "sampled", "full"):
+          raise NotImplementedError("Unknown validation level: {}".format(validate))
+        if validate == "sampled" and validate_every < 1:
+          raise ValueError("validate_every must be at least 1: {}".format(validate_every))
+        self.validate = validate
+        self.validate_every = validate_every
+        self.num_invocations = 0
         self.eviction_policy = policy
 
         self.wall_time = 0              # Current system time
         self.RunningC = dict()          # Container : (launch_time, launch_time+processing_time)
-        self.ContainerPool = []         # simple list of `Container`s
-        self.FunctionHistoryList = []   # list of tuplies (`LambdaData`, invocation_time)
-
-        self.PerfLogFName = os.path.join(log_dir, fname+"performancelog.csv")
-        self.PerformanceLog = open(self.PerfLogFName, "w")
-        self.PerformanceLog.write("lambda,time,meta\n")
-
-        self.evdict = defaultdict(int)
-        self.capacity_misses = defaultdict(int)
+        # min-heap of (time, FINISH/EXPIRE, seq, Container): a finish for everything in RunningC, and an expiry
+        # for idle containers of keep-alive policies. Finishes use pool_seq as seq, expiries event_seq
+        self.EventHeap = []
+        self.event_seq = 0
+        self.ContainerPool = dict()     # Container : None, every pooled container in pool order, O(1) removal
+        self.FuncPool = []              # func_id : {Container : None}, every pooled container of that function in pool order
+        self.IdleC = []                 # func_id : min-heap of (pool_seq, Container) for non-running containers
+        self.pool_seq = 0               # insertion counter, keeps IdleC in ContainerPool order
+
+        # Optional per-event binary log, the counters below are always kept
+        self.EventLog = None
+        if event_log:
+          self.EventLog = EventLog(os.path.join(log_dir, fname+"events.bin"))
+
+        # Counters indexed by func_id, see kind_counts for the {kind : count} dicts results store
+        self.hits = []
+        self.misses = []
+        self.evdict = []
+        self.capacity_misses = []
+        self.expired = []               # containers that reached their keep-alive TTL
+        self.FuncData = []              # func_id : LambdaData, None until that function's first miss
 
         self.provider_overhead_base = 3000 # 3 seconds
         self.provider_overhead_pct = 0.2 # 20% of function runtime added to cold start
 
         # ---- Newly added data structures ----
-        self.lru_cache = {}
-        self.priority_min_heap = []
-
-        if self.eviction_policy == "RAND":
-          # Function to be called pick containers to evict
-          self.EvictionFunc = self.RandomEvictionPicker
-
-        elif self.eviction_policy == "CLOSEST_SIZE_LARGEST_KICK":
-            self.EvictionFunc = self.evict_closest_else_kick_largest
-
-        elif self.eviction_policy == "CLOSEST_SIZE_SMALLEST_KICK":
-            self.EvictionFunc = self.evict_closest_else_kick_smallest
-            
-        elif self.eviction_policy == "LRU":
-            self.EvictionFunc = self.evict_lru
-
-        elif self.eviction_policy == "LFU_CLASSIC":
-            self.EvictionFunc = self.evict_lfu_classic
-
-        elif self.eviction_policy == "LFU_GROUP_CLOSEST":
-            self.EvictionFunc = self.evict_lfu_group_closest
-
-        elif self.eviction_policy == "LFU_GROUP_MAX_COLD_TIME":
-            self.EvictionFunc = self.evict_lfu_group_maxcoldtime
-
-        elif self.eviction_policy == "LFU_GROUP_MAX_INIT_TIME":
-            self.EvictionFunc = self.evict_lfu_group_maxinittime
-
-        elif self.eviction_policy == "LFUGROUP_MAXINITGROUP_CLOSEST":
-            self.EvictionFunc = self.evict_lfu_group_maxinitgroup_closest
-
-        elif self.eviction_policy == "LFUGROUP_CLOSESTGROUP_MAXINIT":
-            self.EvictionFunc = self.evict_lfu_group_closestgroup_maxinit
-        
-        elif self.eviction_policy == "LFUGROUP_MAXINITGROUP_LARGEST":
-            self.EvictionFunc = self.evict_lfu_group_maxinitgroup_largest
-
-        elif self.eviction_policy == "DUAL_GREEDY_PRIORITY":
-            self.EvictionFunc = self.evict_dual_greedy_priority_based
-
-        else:
+        # Keep-alive TTL in ms for policies that expire idle containers, None for the policy's default
+        self.ttl = ttl
+        if self.eviction_policy not in POLICIES:
           raise NotImplementedError("Unkonwn eviction policy: {}".format(self.eviction_policy))
+        # Policy hooks and index structures, see EvictionPolicy.py
+        self.Policy = POLICIES[self.eviction_policy](self)
+        # Function to be called pick containers to evict
+        self.EvictionFunc = self.Policy.select_victims
+
+        # Optional time series sampled every `telemetry_interval` ms of simulated time, see Telemetry.py.
+        # runInvocation samples once an invocation reaches `next_sample`, which never happens without it
+        self.Telemetry = None
+        self.next_sample = float("inf")
+        if telemetry_interval is not None:
+          self.Telemetry = Telemetry(telemetry_interval, telemetry_intervals)
+          self.next_sample = self.Telemetry.next_sample
+
+        # Optional timing of the hot path, see Profiler.py
+        self.Profiler = None
+        if profile:
+          self.Profiler = Profiler()
+          self.Profiler.attach(self)
 
     ##############################################################
 
     def WritePerfLog(self, d:LambdaData, time, meta):
-        msg = "{},{},{}\n".format(d.kind, time, meta)
-        self.PerformanceLog.write(msg)
+        """ Append a "hit"/"miss"/"evict"/"drop"/"expire" event to the event log, if there is one """
+        if self.EventLog is not None:
+          self.EventLog.write(d.kind, time, meta)
+
+    def CloseLogs(self):
+        if self.EventLog is not None:
+          self.EventLog.close()
 
     ##############################################################
 
     def AssertMemory(self):
       """ Raise an exception if the memory assumptions of the simulation have been violated """
+      kind_mem = sum(self.FuncMemUsed)
+      if kind_mem != self.mem_used:
+        raise Exception("Per-function mem '{}' does not match tracked usage '{}'".format(kind_mem, self.mem_used))
       used_mem = sum([c.metadata.mem_size for c in self.ContainerPool])
       if used_mem != self.mem_used:
         raise Exception("Container pool mem '{}' does not match tracked usage '{}'".format(used_mem, self.mem_used))
@@ -105,22 +128,21 @@ class LambdaScheduler:
         Search through the containerpool for a non-running container with the sane metadata as `d`
         Return None if one cannot be found
         """
-        if len(self.ContainerPool) == 0 :
-            return None
-        containers_for_the_lambda = [x for x in self.ContainerPool if (x.metadata == d and
-                                                     x not in self.RunningC)]
+        idle = self.IdleC[d.func_id]
+        # Evicted containers are dropped lazily
+        while len(idle) > 0 and idle[0][1].state == Container.TERM:
+            heappop(idle)
 
-        if containers_for_the_lambda == []:
+        if len(idle) == 0:
             return None
-        else:
-            return containers_for_the_lambda[0]
-        # Just return the first element.
+        # Just return the first element, i.e. the earliest pooled one.
+        return idle[0][1]
 
     ##############################################################
 
     def container_clones(self, c: Container):
         """ Return all the conatienrs have the same function data as `c` """
-        return [x for x in self.ContainerPool if x.metadata == c.metadata]
+        return list(self.FuncPool[c.func_id])
 
     ##############################################################
 
@@ -139,8 +161,12 @@ class LambdaScheduler:
         if mem_size + self.mem_used <= self.mem_capacity:
             #Have free space
             self.mem_used = self.mem_used + mem_size
+            self.FuncMemUsed[c.func_id] += mem_size
 
-            self.ContainerPool.append(c)
+            self.ContainerPool[c] = None
+            self.FuncPool[c.func_id][c] = None
+            c.pool_seq = self.pool_seq
+            self.pool_seq += 1
             return True
         else:
             # print ("Not enough space for memsize, used, capacity.", mem_size, self.mem_used, self.mem_capacity)
@@ -151,313 +177,56 @@ class LambdaScheduler:
     def RemoveFromPool(self, c: Container):
       if c in self.RunningC:
         raise Exception("Cannot remove a running container")
-      self.ContainerPool.remove(c)
+      del self.ContainerPool[c]
+      del self.FuncPool[c.func_id][c]
       self.mem_used -= c.metadata.mem_size
+      self.FuncMemUsed[c.func_id] -= c.metadata.mem_size
+      self.Policy.on_evict(c)
+      # Stale IdleC entry is skipped by find_container
+      c.terminate()
 
-    ############################################################
-
-    def RandomEvictionPicker(self, to_free):
-      """ 
-      Return victim lists
-      Simple eviction that randomly chooses from non-running containers
-      """
-      eviction_list = []
-      # XXX Can't evict running containers!
-      # Even with infinite concurrency, container will still exist in running_c
-      available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-      while to_free > 0 and len(available) > 0:
-        victim = random.choice(available)
-        available.remove(victim)
-        eviction_list.append(victim)
-        to_free -= victim.metadata.mem_size
-
-      return eviction_list
-
-
-    # ----------- Helpers -----------
-
-    def binary_search_closest(self, arr, key):
-        start = 0
-        end = len(arr) - 1
-        while start < end:
-            mid = start + (end - start) // 2
-            if key > arr[mid].metadata.mem_size:
-                start = mid + 1
-            else:
-                end = mid
-        return end
-
-    # -------- Custom policies -----------
-
-    def evict_closest_else_kick_largest(self, to_free):
-        """ Naive approach. Evict a container with a size closest to `to_free`.
-        If `to_free` is greater than max mem size of largest container, then kick out largest container
-
-        Sort the available list first and then perform binary search.
-        This policy is not dependent on warm/cold run time of the function.
-        """
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-        available.sort(key=lambda c: c.metadata.mem_size)
-
-        while to_free > 0 and len(available) > 0:
-            victim_index = self.binary_search_closest(available, to_free)
-            victim = available.pop(victim_index)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-
-    def evict_closest_else_kick_smallest(self, to_free):
-        """ Naive approach. Evict a container with a size closest to `to_free`.
-        If `to_free` is greater than max mem size of largest container, then kick out smallest container
-
-        Sort the available list first and then perform binary search.
-        This policy is not dependent on warm/cold run time of the function.
-        """
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-        available.sort(key=lambda c: c.metadata.mem_size)
-
-        while to_free > 0 and len(available) > 0:
-            if to_free > available[-1].metadata.mem_size:
-                victim_index = 0
-            else:
-                victim_index = self.binary_search_closest(available, to_free)
-            victim = available.pop(victim_index)
-
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-    
-    def evict_lru(self, to_free):
-        """ Evict the least recently used/invoked container """
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        victim_index = 0
-        cache_iterator = iter(self.lru_cache)
-
-        while to_free > 0 and len(available) > 0:
-            victim = next(cache_iterator)
-            if victim not in available:
-                continue
-
-            available.remove(victim)
-            del self.lru_cache[victim]
-            cache_iterator = iter(self.lru_cache)
-
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-
-    def evict_lfu_classic(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Sort descendingly to allow pop in O(1)
-        available.sort(key=lambda c: c.invoke_freq, reverse=True)
-
-        while to_free > 0 and len(available) > 0:
-            victim = available.pop() # O(1)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-
-    def evict_lfu_group_closest(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-        group_size = int(0.1 * len(available)) if len(available) > 40 else 4
-
-        while to_free > 0 and len(available) > 0:
-            available_group = available[:group_size]
-            # binary search to get closest memsize container
-            victim_index = self.binary_search_closest(available_group, to_free)
-            victim = available_group[victim_index]
-
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-        return eviction_list
-
-    def evict_lfu_group_maxcoldtime(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-        group_size = int(0.1 * len(available)) if len(available) > 40 else 4
-
-        while to_free > 0 and len(available) > 0:
-            available_group = available[:group_size]
-
-            # ASCENDING sort by cold start times
-            available_group.sort(key=lambda c: c.metadata.run_time)
-
-            victim = available_group.pop()
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-    
-    def evict_lfu_group_maxinittime(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-
-        group_size = int(0.1 * len(available)) if len(available) > 40 else 4
-
-        while to_free > 0 and len(available) > 0:
-            lfu_group = available[:group_size]
-
-            # ASCENDING sort by initialization time (environment setup time)
-            lfu_group.sort(key=lambda c: c.metadata.run_time - c.metadata.warm_time)
-
-            # choose container with least init/setup time as victim
-            victim = lfu_group[0]
-            
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-
-        return eviction_list
-
-    def evict_lfu_group_maxinitgroup_closest(self, to_free):
-        """
-        Approach:
-            Double-sorted-group approach:
-            - First find "n" LFU containers.
-            - Sort the lfu_group by initialization time.
-            - From the sorted lfu_group, find "m" (where m < n) containers with the least initialization time
-            - This is our maxinit_group. Sort the maxinit_group by mem_size.
-            - In the sorted maxinit_group, perform Binary Search to find closest mem_size container.
-            - This container is chosen as the victim.
-        """
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-
-        lfu_group_size = int(0.1 * len(available)) if len(available) > 40 else 4
-        maxinit_group_size = int(0.05 * len(available)) if len(available) > 40 else 2
-
-        while to_free > 0 and len(available) > 0:
-            lfu_group = available[:lfu_group_size]
-
-            # ASCENDING sort by initialization time
-            lfu_group.sort(key=lambda c: c.metadata.run_time - c.metadata.warm_time)
-
-            maxinit_group = lfu_group[:maxinit_group_size]
-
-            # ASCENDING sort by mem_size
-            maxinit_group.sort(key=lambda c: c.metadata.mem_size)
-
-            # Binary search for the closest sized container from this sorted sub-group
-            victim_index = self.binary_search_closest(maxinit_group, to_free)
-            victim = maxinit_group[victim_index]
-            # victim = maxinit_group[-1] # get largest container
-
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-        
-        return eviction_list
-
-
-    def find_closest_group(self, arr, key, group_size):
-        if group_size >= len(arr):
-            return arr
-        
-        victim_group_start = self.binary_search_closest(arr, key)
-
-        victim_group_start = min(victim_group_start, len(arr) - group_size)
-
-        return arr[victim_group_start:]
-        
-
-    def evict_lfu_group_closestgroup_maxinit(self, to_free):
-        """
-        """
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-        lfu_group_size = int(0.1 * len(available)) if len(available) > 60 else 6
-        closest_group_size = int(0.05 * len(available)) if len(available) > 60 else 3
-        while to_free > 0 and len(available) > 0:
-            lfu_group = available[:lfu_group_size]
-
-            # ASCENDING sort by mem_size
-            lfu_group.sort(key=lambda c: c.metadata.mem_size)
-
-            closest_group = self.find_closest_group(lfu_group, to_free, closest_group_size)
-
-            # ASCENDING sort by initialization time
-            closest_group.sort(key=lambda c: c.metadata.run_time - c.metadata.warm_time)
-
-            # Choose container with least init time from closest group as victim
-            victim = closest_group[0]
-
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-        
-        return eviction_list    
-
-    def evict_lfu_group_maxinitgroup_largest(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
-
-        # Note: Sorting in ascending invoke_freq here, least invoked is at the start
-        available.sort(key=lambda c: c.invoke_freq)
-
-        lfu_group_size = int(0.1 * len(available)) if len(available) > 40 else 4
-        maxinit_group_size = int(0.05 * len(available)) if len(available) > 40 else 2
-
-        while to_free > 0 and len(available) > 0:
-            lfu_group = available[:lfu_group_size]
-
-            # ASCENDING sort by initialization time
-            lfu_group.sort(key=lambda c: c.metadata.run_time - c.metadata.warm_time)
-
-            maxinit_group = lfu_group[:maxinit_group_size]
-
-            # ASCENDING sort by mem_size
-            maxinit_group.sort(key=lambda c: c.metadata.mem_size)
-
-            victim = maxinit_group[-1] # get largest container
-
-            available.remove(victim)
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-        
-        return eviction_list
+    ##############################################################
 
-    def evict_dual_greedy_priority_based(self, to_free):
-        eviction_list = []
-        available = [c for c in self.ContainerPool if c not in self.RunningC]
+    def RunContainer(self, c: Container, processing_time):
+      """ Mark `c` as running until `wall_time + processing_time`, maintaining bookkeeping """
+      if c.state == Container.WARM:
+        idle = self.IdleC[c.func_id]
+        if idle[0][1] is c:
+          heappop(idle)
+        else:
+          idle.remove((c.pool_seq, c))
+          heapify(idle)
+      self.Policy.on_start(c)
+      c.run()
+      fin_t = self.wall_time + processing_time
+      self.RunningC[c] = (self.wall_time, fin_t)
+      heappush(self.EventHeap, (fin_t, self.FINISH, c.pool_seq, c))
 
-        # sort descending
-        available.sort(key=lambda c: c.priority, reverse=True)
+    ##############################################################
 
-        # containers_to_put_back = []
-        while to_free > 0 and len(available) > 0:
-            victim = available.pop()
-            eviction_list.append(victim)
-            to_free -= victim.metadata.mem_size
-        return eviction_list
+    def ReleaseContainer(self, c: Container, t):
+      """ Container `c` finished running at `t`, make it available for warm starts again """
+      del self.RunningC[c]
+      c.prewarm()
+      heappush(self.IdleC[c.func_id], (c.pool_seq, c))
+      self.Policy.on_finish(c)
+      if self.Policy.keep_alive:
+        self.ScheduleExpiry(c, t)
+
+    def ScheduleExpiry(self, c: Container, t):
+      """ Expire idle container `c` once it has been kept alive for the policy's TTL after `t` """
+      ttl = self.Policy.ttl(c)
+      if ttl == float("inf"):
+        return
+      c.expires = t + ttl
+      heappush(self.EventHeap, (c.expires, self.EXPIRE, self.event_seq, c))
+      self.event_seq += 1
+
+    def Expire(self, c: Container, t):
+      """ Keep-alive TTL of idle container `c` ran out at `t` """
+      self.RemoveFromPool(c)
+      self.expired[c.func_id] += 1
+      self.WritePerfLog(c.metadata, t, "expire")
 
     #############################################################
 
@@ -472,8 +241,8 @@ class LambdaScheduler:
         for v in eviction_list:
           self.RemoveFromPool(v)
           # self.mem_used -= v.metadata.mem_size
-          k = v.metadata.kind
-          self.evdict[k] += 1
+          self.evdict[v.func_id] += 1
+          self.WritePerfLog(v.metadata, self.wall_time, "evict")
 
         return eviction_list
 
@@ -488,6 +257,7 @@ class LambdaScheduler:
         Evicts non-running containers in an attempt to make room
         """
         c = Container(d)
+        self.FuncData[d.func_id] = d
 
         if not self.CheckFree(c) : #due to space constraints
           evicted = self.Eviction(d) #Is a list. containers already terminated
@@ -502,23 +272,53 @@ class LambdaScheduler:
     ##############################################################
 
     def cleanup_finished(self):
-        """ Go through running containers, remove those that have finished """
+        """
+        Process the event heap up to `wall_time` in time order: release containers that have finished running
+        and expire idle ones whose TTL ran out. Returns the number of events processed
+        """
         t = self.wall_time
-        finished = []
-        for c in self.RunningC:
-            (start_t, fin_t) = self.RunningC[c]
-            if t >= fin_t:
-                finished.append(c)
+        events = self.EventHeap
+        processed = 0
+        while len(events) > 0 and t >= events[0][0]:
+            ev_t, event, seq, c = heappop(events)
+            if event == self.FINISH:
+                self.ReleaseContainer(c, ev_t)
+            elif c.state == Container.WARM and c.expires == ev_t:
+                # Otherwise it was evicted, or ran again since and its expiry was rescheduled
+                self.Expire(c, ev_t)
+            processed += 1
+
+        return processed
 
-        for c in finished:
-            del self.RunningC[c]
+    ##############################################################
 
-        return len(finished)
+    def add_function(self, d: LambdaData):
+        """
+        Grow the per-function lists to cover `d.func_id`. A scheduler runs the functions of one `FunctionTable`;
+        `LambdaData` that were never interned are numbered by kind in `UNINTERNED` instead
+        """
+        if d.func_id is None:
+            UNINTERNED.number(d)
+        n = d.func_id + 1 - len(self.FuncData)
+        if n > 0:
+            self.FuncData.extend([None] * n)
+            self.FuncPool.extend(dict() for i in range(n))
+            self.IdleC.extend([] for i in range(n))
+            self.FuncMemUsed.extend([0] * n)
+            for counts in (self.hits, self.misses, self.evdict, self.capacity_misses, self.expired):
+                counts.extend([0] * n)
+        return d.func_id
 
     ##############################################################
 
     def runInvocation(self, d: LambdaData, t = 0):
         """ Entrypoint for the simulation """
+        fid = d.func_id
+        if fid is None or fid >= len(self.FuncData):
+            fid = self.add_function(d)
+        if t >= self.next_sample:
+            self.Telemetry.sample(self, t)
+            self.next_sample = self.Telemetry.next_sample
         self.wall_time = t
         self.cleanup_finished()
 
@@ -530,62 +330,118 @@ class LambdaScheduler:
             c = self.cache_miss(d)
             if c is None:
                 # insufficient memory
-                self.capacity_misses[d.kind] += 1
+                self.capacity_misses[fid] += 1
+                self.WritePerfLog(d, t, "drop")
                 return
-            c.run()
             processing_time = self.ColdHitProcTime(d)
-            self.RunningC[c] = (t, t+processing_time)
+            self.RunContainer(c, processing_time)
+            c.invoke_freq += 1
+            self.Policy.on_miss(c)
+            self.misses[fid] += 1
             self.WritePerfLog(d, t, "miss")
         else:
-            c.run()
             processing_time = d.warm_time
-            self.RunningC[c] = (t, t+processing_time)
+            self.RunContainer(c, processing_time)
+            c.invoke_freq += 1
+            self.Policy.on_hit(c)
+            self.hits[fid] += 1
             self.WritePerfLog(d, t, "hit")
 
-            if self.eviction_policy == "LRU":
-                # if hit, pop first to "move_to_front" later
-                self.lru_cache.pop(c) # lru_cache is a dict, dict.pop() is like list.remove()
+        self.num_invocations += 1
+        if self.validate == "full":
+            self.AssertMemory()
+        elif self.validate == "sampled" and self.num_invocations % self.validate_every == 0:
+            self.AssertMemory()
 
+    ##############################################################
 
-        if self.eviction_policy == "LRU":      
-            self.lru_cache[c] = None
-
-        c.invoke_freq += 1
+    def runTrace(self, funcs, func_ids, times, start:int=0, checkpointer=None, chunk:int=65536):
+        """
+        Run a columnar trace: `funcs` is the function table, `func_ids` and `times` are parallel arrays
+        (possibly memory-mapped, see ColumnarTrace.py). Converted a chunk at a time to Python scalars.
+        Starts at invocation `start`, and offers a checkpoint to `checkpointer` after every chunk.
+        """
+        if checkpointer is not None:
+            chunk = max(1, min(chunk, checkpointer.every))
+        for start in range(start, len(func_ids), chunk):
+            ids = func_ids[start:start+chunk].tolist()
+            ts = times[start:start+chunk].tolist()
+            for fid, t in zip(ids, ts):
+                self.runInvocation(funcs[fid], t)
+            if checkpointer is not None and checkpointer.due(start + len(ids)):
+                checkpointer.save(self, start + len(ids))
+
+    def runChunks(self, chunks, start:int=0, checkpointer=None):
+        """
+        Run a trace streamed as lists of (LambdaData, time), e.g. from TraceSource.py, that begins at invocation `start`.
+        Offers a checkpoint to `checkpointer` after every chunk. Returns the offset after the last invocation
+        """
+        for chunk in chunks:
+            for d, t in chunk:
+                self.runInvocation(d, t)
+            start += len(chunk)
+            if checkpointer is not None and checkpointer.due(start):
+                checkpointer.save(self, start)
+        return start
 
-        # For the dual-greedy approach given in the FaaSCache paper (cited in the report)
-        if self.eviction_policy == "DUAL_GREEDY_PRIORITY":
-            c.priority = self.wall_time + (c.init_time * c.invoke_freq / c.metadata.mem_size)
+    ##############################################################
 
-        self.FunctionHistoryList.append((d,t))
-        self.AssertMemory()
+    def fork(self, policy:str):
+        """
+        Independent copy of this scheduler that continues under `policy`, its index rebuilt from the current
+        containers. Only equivalent to having run `policy` from the start while nothing was evicted, see PrefixFork.py
+        """
+        if self.EventLog is not None:
+          raise Exception("Cannot fork a scheduler that writes an event log")
+        check_policy(policy)
+
+        # The running policy is not copied, the fork gets a fresh one
+        current = (self.Policy, self.EvictionFunc)
+        self.Policy = self.EvictionFunc = None
+        try:
+          L = copy.deepcopy(self)
+        finally:
+          self.Policy, self.EvictionFunc = current
+
+        L.eviction_policy = policy
+        L.Policy = POLICIES[policy](L)
+        L.EvictionFunc = L.Policy.select_victims
+        if L.Profiler is not None:
+          L.Profiler.attach(L)
+        L.Policy.rebuild()
+        return L
 
     ##############################################################
 
     def miss_stats(self):
-        """ Go through the performance log."""
+        """ dict of function names whose entries are {"misses":count, "hits":count} """
         rdict = dict() #For each activation
-        with open(self.PerfLogFName, "r") as f:
-            line = f.readline() # throw away header
-            for line in f:
-                line = line.rstrip()
-                d, ptime, evtype = line.split(",")
-                k = d
-                if k not in rdict:
-                    mdict = dict()
-                    mdict['misses'] = 0
-                    mdict['hits'] = 0
-                    rdict[k] = mdict
-
-                if evtype == "miss":
-                    rdict[k]['misses'] = rdict[k]['misses'] + 1
-                elif evtype == "hit":
-                    rdict[k]['hits'] = rdict[k]['hits'] + 1
-                else:
-                    pass
+        for fid, (misses, hits) in enumerate(zip(self.misses, self.hits)):
+            if misses + hits > 0:
+                rdict[self.FuncData[fid].kind] = {'misses': misses, 'hits': hits}
 
         #Also some kind of response time data?
         return rdict
 
+    def kind_counts(self, counts):
+        """ {kind : count} of one of the func_id-indexed counters, e.g. `evdict`, leaving out functions it never counted """
+        return {self.FuncData[fid].kind: n for fid, n in enumerate(counts) if n > 0}
+
+    def latency_histogram(self):
+        """
+        Response-time histograms per function and overall, see LatencyHistogram.py.
+        A hit always takes `warm_time` and a miss `ColdHitProcTime`, so they follow exactly from the
+        hit/miss counters and nothing is recorded per invocation
+        """
+        fids = [fid for fid, d in enumerate(self.FuncData) if d is not None]
+        h = LatencyHistogram([self.FuncData[fid].kind for fid in fids])
+        for j, fid in enumerate(fids):
+            d = self.FuncData[fid]
+            h.add(d.kind, d.warm_time, self.hits[fid])
+            h.add(d.kind, self.ColdHitProcTime(d), self.misses[fid])
+            h.dropped[j] = self.capacity_misses[fid]
+        return h
+
     ##############################################################
     ##############################################################
     ##############################################################
@@ -605,7 +461,7 @@ if __name__ == "__main__":
 
     print("\n\nDONE\n")
 
-    pprint(ls.evdict)
+    pprint(ls.kind_counts(ls.evdict))
     pprint(ls.miss_stats())
-    print("cap", ls.capacity_misses)
+    print("cap", ls.kind_counts(ls.capacity_misses))
 
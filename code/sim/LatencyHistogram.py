@@ -0,0 +1,72 @@
+"""
+Log-bucketed response-time histograms, per function and overall.
+
+Buckets are HDR-style: `SUB_BUCKETS` per doubling from `MIN_MS`, so every bucket is about 9% wide and a
+quantile read from one is within that of the true value. Bucket 0 holds latencies under `MIN_MS`, the last
+bucket everything past the range. Capacity misses have no latency and are counted in `dropped` instead.
+
+Results store the histogram as the plain dict of `to_dict`, so they unpickle without this module.
+"""
+import numpy as np
+
+MIN_MS = 1.0
+SUB_BUCKETS = 8
+DOUBLINGS = 24          # up to MIN_MS * 2**24 ms, about 4.6 hours
+NUM_BUCKETS = DOUBLINGS * SUB_BUCKETS + 2
+
+def bucket_index(ms):
+    """ Bucket of a latency in ms, or an array of them """
+    ms = np.asarray(ms, dtype=np.float64)
+    idx = np.floor(np.log2(np.maximum(ms, MIN_MS) / MIN_MS) * SUB_BUCKETS).astype(np.int64) + 1
+    idx = np.where(ms < MIN_MS, 0, idx)
+    return np.minimum(idx, NUM_BUCKETS - 1)
+
+def bucket_upper(idx):
+    """ Upper bound in ms of a bucket, or an array of them """
+    return MIN_MS * np.exp2(np.asarray(idx, dtype=np.float64) / SUB_BUCKETS)
+
+class LatencyHistogram:
+
+    def __init__(self, kinds=()):
+        self.kinds = list(kinds)
+        self.index = {k: j for j, k in enumerate(self.kinds)}
+        self.counts = np.zeros((len(self.kinds), NUM_BUCKETS), dtype=np.int64)  # function x bucket
+        self.dropped = np.zeros(len(self.kinds), dtype=np.int64)
+
+    def add(self, kind, ms, count=1):
+        """ Count `count` invocations of `kind` that took `ms` """
+        self.counts[self.index[kind], int(bucket_index(ms))] += count
+
+    def total(self, kind=None):
+        """ Bucket counts of one function, or of all of them """
+        if kind is None:
+            return self.counts.sum(axis=0)
+        return self.counts[self.index[kind]]
+
+    def quantile(self, q, kind=None):
+        """ Upper bound of the bucket holding quantile `q` of served invocations, nan if there are none """
+        counts = self.total(kind)
+        n = counts.sum()
+        if n == 0:
+            return float("nan")
+        idx = int(np.searchsorted(np.cumsum(counts), q * n))
+        return float(bucket_upper(min(idx, NUM_BUCKETS - 1)))
+
+    def merge(self, other):
+        """ Histogram of both, e.g. of two runs or two traces; functions are matched by kind """
+        out = LatencyHistogram(list(dict.fromkeys(self.kinds + other.kinds)))
+        for h in (self, other):
+            rows = [out.index[k] for k in h.kinds]
+            np.add.at(out.counts, rows, h.counts)
+            np.add.at(out.dropped, rows, h.dropped)
+        return out
+
+    def to_dict(self):
+        return {"kinds": self.kinds, "counts": self.counts, "dropped": self.dropped}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(d["kinds"])
+        h.counts = np.asarray(d["counts"], dtype=np.int64)
+        h.dropped = np.asarray(d["dropped"], dtype=np.int64)
+        return h
@@ -1,48 +1,190 @@
 #!/usr/bin/python3
 import multiprocessing as mp
 from LambdaScheduler import LambdaScheduler
+from ColumnarTrace import load_columnar, columnar_name, to_columns
+from TraceSource import ShardedTrace, shards_name, columnar_chunks
+from StackDistance import LRUStackDistance
+from FunctionTable import FunctionTable
+from Checkpoint import Checkpointer
 import pickle
+import cProfile
 import argparse
 import os
 
 def load_trace(num_functions, char, trace_path):
     fname = "{}-{}.pckl".format(num_functions, char)
     with open(os.path.join(trace_path, fname), "r+b") as f:
-        return pickle.load(f)
+        lambdas, trace = pickle.load(f)
+    return lambdas, FunctionTable().intern_trace(trace)
+
+def load_columnar_trace(num_functions, char, trace_path):
+    """ Memory-mapped columnar copy of the trace if one was converted, else None """
+    return load_columnar(os.path.join(trace_path, columnar_name(num_functions, char)))
+
+def load_sharded_trace(num_functions, char, trace_path):
+    """ Per-function shards of the trace if it was sharded, else None """
+    return ShardedTrace.open(os.path.join(trace_path, shards_name(num_functions, char)))
+
+def open_trace(num_functions, char, trace_path, chunk=65536, start=0):
+    """
+    Return (lambdas, len_trace, chunks) where `chunks` yields the trace from invocation `start` as lists of
+    (LambdaData, time). Columnar and sharded traces are decoded `chunk` invocations at a time
+    """
+    columnar = load_columnar_trace(num_functions, char, trace_path)
+    if columnar is not None:
+        lambdas, funcs, func_ids, times = columnar
+        return lambdas, len(func_ids), columnar_chunks(funcs, func_ids, times, start, chunk)
+
+    sharded = load_sharded_trace(num_functions, char, trace_path)
+    if sharded is not None:
+        return sharded.lambdas, len(sharded), sharded.chunks(start, chunk)
+
+    lambdas, trace = load_trace(num_functions, char, trace_path)
+    def chunks():
+        for pos in range(start, len(trace), chunk):
+            yield trace[pos:pos+chunk]
+    return lambdas, len(trace), chunks()
+
+def result_name(policy, num_functions, mem_capacity, char):
+    return "{}-{}-{}-{}.pckl".format(policy, num_functions, mem_capacity, char)
+
+def save_result(save_pth, policy, evdict, miss_stats, lambdas, capacity_misses, len_trace, latency=None):
+    # policy = string
+    # evdict:     dict[func_name] = eviction_count, `L.kind_counts(L.evdict)`
+    # L.miss_stats: dict of function names whos entries are  {"misses":count, "hits":count}
+    # lambdas:    dict[func_name] = (mem_size, cold_time, warm_time)
+    # capacity_misses: dict[func_name] = invocations_not_handled
+    # len_trace: long
+    # latency: `LatencyHistogram.to_dict()` of the run, or None. Results saved before it have only the first six fields
+    data = (policy, evdict, miss_stats, lambdas, capacity_misses, len_trace, latency)
+    with open(save_pth, "w+b") as f:
+        pickle.dump(data, f)
+
+def profile_name(save_pth, ext=".profile.json"):
+    """ Path of the profiling output for the result pickle at `save_pth` """
+    return os.path.splitext(save_pth)[0] + ext
+
+def make_scheduler(policy, num_functions, char, mem_capacity, args):
+    return LambdaScheduler(policy, mem_capacity, num_functions, char, args.logdir,
+                           validate=args.validate, validate_every=args.validate_every, event_log=args.eventlog,
+                           profile=args.profile, telemetry_interval=args.telemetry, ttl=args.ttl)
 
 def compare_pols(policy, num_functions, char, mem_capacity=32000, args=None):
-    save_pth = args.savedir
-    log_dir = args.logdir
-    name = "{}-{}-{}-{}.pckl".format(policy, num_functions, mem_capacity, char)
-    save_pth = os.path.join(save_pth, name)
+    name = result_name(policy, num_functions, mem_capacity, char)
+    save_pth = os.path.join(args.savedir, name)
 
     if not os.path.exists(save_pth):
-        L = LambdaScheduler(policy, mem_capacity, num_functions, char, log_dir)
-        lambdas, trace = load_trace(num_functions, char, args.tracedir)
-        i = 0
-        for d, t in trace:
-            i += 1
-            L.runInvocation(d, t)
-
-        L.PerformanceLog.flush()
-        L.PerformanceLog.close()
-
-        # policy = string
-        # L.evdict:    dict[func_name] = eviction_count
-        # L.miss_stats: dict of function names whos entries are  {"misses":count, "hits":count}
-        # lambdas:    dict[func_name] = (mem_size, cold_time, warm_time)
-        # capacity_misses: dict[func_name] = invocations_not_handled
-        # len_trace: long
-        data = (policy, L.evdict, L.miss_stats(), lambdas, L.capacity_misses, len(trace))
-        with open(save_pth, "w+b") as f:
-            pickle.dump(data, f)
+        # Columnar traces run straight off the memory-mapped arrays, sharded ones are merged as they stream in.
+        # Only a pickled trace is loaded whole
+        sharded = None
+        columnar = load_columnar_trace(num_functions, char, args.tracedir)
+        if columnar is not None:
+            lambdas, funcs, func_ids, times = columnar
+        else:
+            sharded = load_sharded_trace(num_functions, char, args.tracedir)
+            if sharded is None:
+                lambdas, trace = load_trace(num_functions, char, args.tracedir)
+                funcs, func_ids, times = to_columns(trace)
+                del trace
+
+        checkpointer = None
+        resumed = None
+        if args.checkpointdir is not None:
+            checkpointer = Checkpointer(os.path.join(args.checkpointdir, name + ".ckpt"),
+                                        args.checkpoint_every, args.checkpoint_secs)
+            resumed = checkpointer.load()
+
+        if resumed is not None:
+            L, start = resumed
+            print("resuming", name, "at invocation", start)
+        else:
+            L, start = make_scheduler(policy, num_functions, char, mem_capacity, args), 0
+        prof = None
+        if args.cprofile:
+            prof = cProfile.Profile()
+            prof.enable()
+        if sharded is not None:
+            lambdas, len_trace = sharded.lambdas, len(sharded)
+            chunk = 65536 if checkpointer is None else max(1, min(65536, checkpointer.every))
+            L.runChunks(sharded.chunks(start, chunk), start=start, checkpointer=checkpointer)
+        else:
+            len_trace = len(func_ids)
+            L.runTrace(funcs, func_ids, times, start=start, checkpointer=checkpointer)
+        if prof is not None:
+            prof.disable()
+            prof.dump_stats(profile_name(save_pth, ".cprof"))
+
+        L.CloseLogs()
+        save_result(save_pth, policy, L.kind_counts(L.evdict), L.miss_stats(), lambdas, L.kind_counts(L.capacity_misses), len_trace,
+                    L.latency_histogram().to_dict())
+        if L.Profiler is not None:
+            L.Profiler.save(profile_name(save_pth), L)
+        if L.Telemetry is not None:
+            L.Telemetry.save(profile_name(save_pth, ".telemetry.npz"), L)
+        if checkpointer is not None:
+            checkpointer.remove()
 
     print("done", name)
 
+def sweep_pols(policy, num_functions, char, mems, args):
+    """
+    Simulate every capacity in `mems` in lockstep over a single pass of the trace.
+    Each decoded chunk is replayed by every scheduler in turn, so the trace is loaded and decoded once.
+    Writes the same per-capacity result pickles as `compare_pols`.
+    """
+    todo = []
+    for mem in mems:
+        save_pth = os.path.join(args.savedir, result_name(policy, num_functions, mem, char))
+        if not os.path.exists(save_pth):
+            todo.append((mem, save_pth, make_scheduler(policy, num_functions, char, mem, args)))
+
+    if len(todo) > 0:
+        lambdas, len_trace, chunks = open_trace(num_functions, char, args.tracedir)
+        for chunk in chunks:
+            for mem, save_pth, L in todo:
+                # Through runChunks so a profiled scheduler times the chunk and counts its invocations
+                L.runChunks((chunk,))
+
+        for mem, save_pth, L in todo:
+            L.CloseLogs()
+            save_result(save_pth, policy, L.kind_counts(L.evdict), L.miss_stats(), lambdas, L.kind_counts(L.capacity_misses), len_trace,
+                        L.latency_histogram().to_dict())
+            if L.Profiler is not None:
+                L.Profiler.save(profile_name(save_pth), L)
+            if L.Telemetry is not None:
+                L.Telemetry.save(profile_name(save_pth, ".telemetry.npz"), L)
+
+    for mem in mems:
+        print("done", result_name(policy, num_functions, mem, char))
+
+STACKDIST_POLICY = "LRU_STACKDIST"
+
+def stackdist_pols(num_functions, char, mems, args):
+    """
+    One-pass LRU stack-distance estimate of the hit ratio at every capacity in `mems`, see StackDistance.py.
+    Results are saved as policy `LRU_STACKDIST`, with no eviction or capacity-miss accounting.
+    """
+    lambdas, len_trace, chunks = open_trace(num_functions, char, args.tracedir)
+    sd = LRUStackDistance(mems)
+    for chunk in chunks:
+        for d, t in chunk:
+            sd.access(d)
+
+    for mem in mems:
+        name = result_name(STACKDIST_POLICY, num_functions, mem, char)
+        save_result(os.path.join(args.savedir, name), STACKDIST_POLICY, dict(), sd.miss_stats(mem), lambdas, dict(), len_trace)
+        print("done", name)
+
 def run_multiple_expts(args):
     policy = args.policy
     num_func = args.numfuncs
     char = args.char
+    mems = [int(mem) for mem in args.mem]
+    if args.stackdist:
+        return stackdist_pols(num_func, char, mems, args)
+    if args.sweep:
+        return sweep_pols(policy, num_func, char, mems, args)
+
     results = []
     with mp.Pool() as pool:
       for mem in args.mem:
@@ -64,12 +206,33 @@ if __name__ == "__main__":
     parser.add_argument("--logdir", type=str, default="/data/alfuerst/verify-test/logs/", required=False)
     parser.add_argument("--mem", required=True, action='append')
     parser.add_argument("--policy", type=str, default="RAND", required=False)
+    parser.add_argument("--validate", type=str, default="full", choices=["off", "sampled", "full"], required=False)
+    parser.add_argument("--validate_every", type=int, default=1000, required=False)
+    parser.add_argument("--eventlog", action="store_true", help="write a binary per-event log to --logdir")
+    parser.add_argument("--checkpointdir", type=str, default=None, required=False,
+                        help="checkpoint each simulation here and resume from it after a crash")
+    parser.add_argument("--checkpoint_every", type=int, default=1000000, required=False, help="invocations between checkpoints")
+    parser.add_argument("--checkpoint_secs", type=float, default=600, required=False, help="seconds between checkpoints")
+    parser.add_argument("--sweep", action="store_true", help="simulate all --mem values in lockstep over one pass of the trace")
+    parser.add_argument("--stackdist", action="store_true", help="one-pass LRU stack-distance estimate for all --mem values, ignores --policy")
+    parser.add_argument("--profile", action="store_true", help="time the scheduler's phases, saved as <result>.profile.json")
+    parser.add_argument("--telemetry", type=float, default=None, required=False,
+                        help="sample pool size, memory, evictions and cold starts every this many ms of simulated time, saved as <result>.telemetry.npz")
+    parser.add_argument("--ttl", type=float, default=None, required=False,
+                        help="keep-alive TTL in ms of the TTL_* policies, inf never expires")
+    parser.add_argument("--cprofile", action="store_true", help="run each simulation under cProfile, saved as <result>.cprof")
     
     args = parser.parse_args()
+    if args.validate_every < 1:
+        parser.error("--validate_every must be at least 1")
+    if args.telemetry is not None and not args.telemetry > 0:
+        parser.error("--telemetry must be positive")
     if not os.path.exists(args.savedir):
         os.makedirs(args.savedir)
     if not os.path.exists(args.logdir):
         os.makedirs(args.logdir)
+    if args.checkpointdir is not None and not os.path.exists(args.checkpointdir):
+        os.makedirs(args.checkpointdir)
 
     print(args)
     run_multiple_expts(args)
@@ -0,0 +1,68 @@
+"""
+Share the warm-up of a trace between policies.
+
+Until the first eviction every policy makes the same decisions: warm lookups, cold starts and capacity misses
+do not depend on the policy. `run_prefix` simulates that prefix once under a `PrefixPolicy`, and
+`LambdaScheduler.fork` then copies the state into one scheduler per policy, which continues from there.
+Keep-alive policies expire containers before anything is evicted, so they have no shared prefix and run on their own.
+"""
+from functools import partial
+from EvictionPolicy import *
+
+class PrefixEnd(Exception):
+    """ Raised by `PrefixPolicy` when the simulation first needs to evict """
+    pass
+
+def forkable(policy:str):
+    """ Whether `policy` can continue from a shared prefix """
+    check_policy(policy)
+    factory = POLICIES[policy]
+    # The LFU_GROUP_* policies are registered as partials of their class
+    while isinstance(factory, partial):
+        factory = factory.func
+    return not getattr(factory, "keep_alive", False)
+
+class PrefixPolicy(EvictionPolicy):
+    """
+    Stand-in policy for simulating a prefix on behalf of several policies.
+    Forwards on_hit/on_miss to each of them, so the per-container keys they maintain (last_used, priority, ...)
+    are what each policy would have set. Their indexes are not kept, `fork` rebuilds them.
+    """
+
+    def __init__(self, sched, policies):
+        super().__init__(sched)
+        for p in policies:
+            if not forkable(p):
+                raise NotImplementedError("Keep-alive policy {} cannot share a prefix".format(p))
+        self.policies = [POLICIES[p](sched) for p in policies]
+
+    def on_hit(self, c: Container):
+        for p in self.policies:
+            p.on_hit(c)
+
+    def on_miss(self, c: Container):
+        for p in self.policies:
+            p.on_miss(c)
+
+    def select_victims(self, to_free):
+        raise PrefixEnd()
+
+def run_prefix(sched, policies, funcs, func_ids, times, chunk:int=65536):
+    """
+    Run a columnar trace on a fresh `sched` for all of `policies` until the first eviction.
+    Returns the offset of the invocation that needed it, which every fork re-runs from the top;
+    `len(func_ids)` if the whole trace fits without evicting.
+
+    Stopping inside that invocation is safe: only its `cleanup_finished` has run, and that is a no-op
+    when the fork runs it again at the same time.
+    """
+    sched.Policy = PrefixPolicy(sched, policies)
+    if sched.Profiler is None:
+        # A profiled scheduler's EvictionFunc already calls whatever Policy is current
+        sched.EvictionFunc = sched.Policy.select_victims
+    try:
+        sched.runTrace(funcs, func_ids, times, chunk=chunk)
+    except PrefixEnd:
+        # Every earlier invocation was either run or dropped, the interrupted one is neither
+        return sched.num_invocations + sum(sched.capacity_misses)
+    return len(func_ids)
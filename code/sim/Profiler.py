@@ -0,0 +1,95 @@
+"""
+Opt-in timing of the `LambdaScheduler` hot path.
+
+`Profiler.attach` shadows the timed methods with instance attributes that wrap the class methods, so a
+scheduler created without `profile=True` runs the plain methods and pays nothing.
+Phase times are inclusive: `cleanup_finished` includes the `ReleaseContainer` calls it makes, and the
+`Eviction` time includes `EvictionFunc` and the `WritePerfLog` calls for the victims.
+"""
+import json
+import time
+from collections import defaultdict
+
+# Scheduler methods that are timed, by name
+PHASES = ["find_container", "cleanup_finished", "cache_miss", "Eviction", "AssertMemory", "WritePerfLog"]
+
+class Timed:
+    """ Stands in for the bound method `func` of `sched`, adding its run time to `profiler` under `name` """
+
+    def __init__(self, profiler, sched, name, func):
+        self.profiler = profiler
+        self.sched = sched
+        self.name = name
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.func(self.sched, *args, **kwargs)
+        finally:
+            self.profiler.record(self.name, time.perf_counter() - start)
+
+class TimedTrace(Timed):
+    """ `Timed` for `runTrace` and `runChunks`, also counting the invocations they ran """
+
+    def __call__(self, *args, **kwargs):
+        before = self.sched.num_invocations
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            self.profiler.trace_invocations += self.sched.num_invocations - before
+
+class TimedEviction:
+    """ Stands in for `EvictionFunc`, also counting victims and the idle pool at every eviction """
+
+    def __init__(self, profiler, sched):
+        self.profiler = profiler
+        self.sched = sched
+
+    def __call__(self, to_free):
+        start = time.perf_counter()
+        victims = self.sched.Policy.select_victims(to_free)
+        self.profiler.record("EvictionFunc", time.perf_counter() - start)
+        self.profiler.eviction_sizes[len(victims)] += 1
+        self.profiler.idle_sizes[len(self.sched.ContainerPool) - len(self.sched.RunningC)] += 1
+        return victims
+
+class Profiler:
+
+    def __init__(self):
+        self.times = defaultdict(float)        # phase : cumulative seconds
+        self.calls = defaultdict(int)          # phase : number of calls
+        self.eviction_sizes = defaultdict(int) # containers evicted by one EvictionFunc call : count
+        self.idle_sizes = defaultdict(int)     # non-running containers in the pool when evicting : count
+        self.trace_invocations = 0             # invocations run inside runTrace or runChunks
+
+    def attach(self, sched, phases=PHASES):
+        """ Time `phases` of `sched` from now on, `runTrace`, `runChunks` and `EvictionFunc` are always timed """
+        for name in phases:
+            setattr(sched, name, Timed(self, sched, name, getattr(type(sched), name)))
+        sched.runTrace = TimedTrace(self, sched, "runTrace", type(sched).runTrace)
+        sched.runChunks = TimedTrace(self, sched, "runChunks", type(sched).runChunks)
+        sched.EvictionFunc = TimedEviction(self, sched)
+
+    def record(self, name, secs):
+        self.times[name] += secs
+        self.calls[name] += 1
+
+    def report(self, sched):
+        """ Summary dict for `sched`, invocations per second are those run by `runTrace`/`runChunks` over the time spent in them """
+        run_time = self.times.get("runTrace", 0.0) + self.times.get("runChunks", 0.0)
+        return {
+            "policy": sched.eviction_policy,
+            "mem_capacity": sched.mem_capacity,
+            "invocations": sched.num_invocations,
+            "trace_invocations": self.trace_invocations,
+            "run_time": run_time,
+            "invocations_per_sec": self.trace_invocations / run_time if run_time > 0 else None,
+            "phases": {name: {"time": self.times[name], "calls": self.calls[name]} for name in sorted(self.times)},
+            "eviction_sizes": {str(k): v for k, v in sorted(self.eviction_sizes.items())},
+            "idle_sizes": {str(k): v for k, v in sorted(self.idle_sizes.items())},
+        }
+
+    def save(self, path, sched):
+        with open(path, "w") as f:
+            json.dump(self.report(sched), f, indent=1)
@@ -0,0 +1,69 @@
+from bisect import bisect_left, insort
+from Container import *
+
+class SizeBuckets:
+    """
+    Non-running containers of the pool bucketed by `mem_size`.
+    `sizes` is the sorted list of distinct sizes currently held. Each bucket keeps its containers
+    in pool order, which is the order a stable sort of `ContainerPool` by size leaves them in.
+    Function sizes come from a small set per trace, so the buckets stay few and the sort is never redone.
+    """
+
+    def __init__(self):
+        self.sizes = []         # sorted distinct mem_size values
+        self.buckets = dict()   # mem_size : list of (pool_seq, Container) sorted by pool_seq
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, c: Container):
+        """ `c` became available for eviction """
+        size = c.metadata.mem_size
+        bucket = self.buckets.get(size)
+        if bucket is None:
+            bucket = self.buckets[size] = []
+            insort(self.sizes, size)
+        insort(bucket, (c.pool_seq, c))
+        self.count += 1
+
+    def discard(self, c: Container):
+        """ `c` started running or left the pool """
+        size = c.metadata.mem_size
+        bucket = self.buckets.get(size)
+        if bucket is None:
+            return
+        i = bisect_left(bucket, (c.pool_seq,))
+        if i < len(bucket) and bucket[i][1] is c:
+            self._take(size, i)
+
+    def _take(self, size, i):
+        bucket = self.buckets[size]
+        seq, c = bucket.pop(i)
+        self.count -= 1
+        if len(bucket) == 0:
+            del self.buckets[size]
+            self.sizes.pop(bisect_left(self.sizes, size))
+        return c
+
+    def max_size(self):
+        return self.sizes[-1]
+
+    def pop_closest(self, key):
+        """
+        Remove and return the earliest pooled container of the smallest size >= `key`.
+        Falls back to `pop_largest` if every container is smaller, like `LFUGroupEngine.lower_bound`
+        """
+        i = bisect_left(self.sizes, key)
+        if i == len(self.sizes):
+            return self.pop_largest()
+        return self._take(self.sizes[i], 0)
+
+    def pop_largest(self):
+        """ Remove and return the latest pooled container of the largest size """
+        size = self.sizes[-1]
+        return self._take(size, len(self.buckets[size]) - 1)
+
+    def pop_smallest(self):
+        """ Remove and return the earliest pooled container of the smallest size """
+        return self._take(self.sizes[0], 0)
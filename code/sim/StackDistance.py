@@ -0,0 +1,99 @@
+from bisect import bisect_left
+import numpy as np
+from LambdaData import *
+
+class FenwickTree:
+    """ Prefix sums over a fixed size array, O(log n) point update and query """
+
+    def __init__(self, size:int=1024):
+        self.tree = [0] * (size + 1)
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, i, delta):
+        i += 1
+        tree = self.tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & (-i)
+
+    def prefix(self, i):
+        """ Sum of positions [0, i) """
+        s = 0
+        tree = self.tree
+        while i > 0:
+            s += tree[i]
+            i -= i & (-i)
+        return s
+
+class LRUStackDistance:
+    """
+    One-pass Mattson stack-distance analysis of size-aware LRU.
+    Each function is one cached object of `mem_size` MB. An access is a hit at every capacity at least as large
+    as its stack distance: the memory of the distinct functions touched since its previous access, itself included.
+
+    This idealizes the simulator's LRU keep-alive. It ignores concurrent invocations (which need extra containers)
+    and running containers that cannot be evicted, so it is an estimate of `LRU` results, exact when
+    functions never overlap with themselves.
+    """
+
+    def __init__(self, mems):
+        self.mems = sorted(mems)
+        self.tree = FenwickTree()
+        self.now = 0
+        self.last = dict()              # kind : position of its latest access in `tree`
+        self.sizes = dict()             # kind : mem_size
+        self.counts = dict()            # kind : array, counts[k][i] = accesses with distance in (mems[i-1], mems[i]]
+                                        # last slot counts accesses that miss at every capacity
+
+    def distance(self, d: LambdaData):
+        """ Record an access to `d`, return its stack distance in MB (None for a first access) """
+        if self.now == len(self.tree):
+            self.compact()
+        prev = self.last.get(d.kind)
+        if prev is None:
+            dist = None
+        else:
+            dist = self.tree.prefix(self.now) - self.tree.prefix(prev + 1) + d.mem_size
+            self.tree.add(prev, -d.mem_size)
+        self.tree.add(self.now, d.mem_size)
+        self.last[d.kind] = self.now
+        self.sizes[d.kind] = d.mem_size
+        self.now += 1
+        return dist
+
+    def access(self, d: LambdaData):
+        dist = self.distance(d)
+        counts = self.counts.get(d.kind)
+        if counts is None:
+            counts = self.counts[d.kind] = np.zeros(len(self.mems) + 1, dtype=np.int64)
+        if dist is None:
+            counts[-1] += 1
+        else:
+            counts[bisect_left(self.mems, dist)] += 1
+
+    def compact(self):
+        """
+        Renumber live positions to 0..n-1, keeping their order. Only one position per function is live,
+        so the tree stays proportional to the number of functions; grow it if it is half full anyway.
+        """
+        live = sorted(self.last.items(), key=lambda kv: kv[1])
+        size = len(self.tree)
+        if 2 * len(live) > size:
+            size *= 2
+        self.tree = FenwickTree(size)
+        for pos, (kind, old) in enumerate(live):
+            self.last[kind] = pos
+            self.tree.add(pos, self.sizes[kind])
+        self.now = len(live)
+
+    def miss_stats(self, mem):
+        """ dict[kind] = {"misses":count, "hits":count} at capacity `mem`, same shape as `LambdaScheduler.miss_stats` """
+        i = self.mems.index(mem)
+        rdict = dict()
+        for k, counts in self.counts.items():
+            hits = int(counts[:i+1].sum())
+            rdict[k] = {"misses": int(counts.sum()) - hits, "hits": hits}
+        return rdict
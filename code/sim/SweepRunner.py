@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+"""
+Run a whole grid of policy x numfuncs x char x mem simulations on one process pool.
+
+Each trace is loaded once into `multiprocessing.shared_memory` as function-id and time arrays, and every
+worker maps those blocks instead of loading its own copy. Cells that already have a result pickle are skipped,
+the rest are queued longest first and handed out one at a time, so idle workers keep taking jobs until the
+grid is done. A consolidated `results.csv` with one row per cell is written at the end.
+
+With `--fork` the prefix of the trace before the first eviction is simulated once per numfuncs x char x mem cell,
+see PrefixFork.py. That prefix job saves one fork of the scheduler per pending policy, pickled like a checkpoint,
+and each fork then continues as a job of its own, so the policies of a cell still run in parallel. The prefix
+itself runs on one worker before any of its forks can start; at large memory sizes it can be most of the trace,
+which then runs once instead of once per policy but without overlapping the other jobs of that cell.
+Keep-alive policies, and cells with a single pending policy, run as plain jobs.
+"""
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import pickle
+import time
+import numpy as np
+from LambdaScheduler import LambdaScheduler
+from ColumnarTrace import to_columns
+from FunctionTable import FunctionTable
+from PrefixFork import run_prefix, forkable
+from Checkpoint import Checkpointer
+from LatencyHistogram import LatencyHistogram
+from ParallelRunner import load_trace, load_columnar_trace, result_name, save_result, make_scheduler, profile_name
+
+TABLE_HEADER = "policy,numfuncs,mem,char,cold_pct,dropped_pct,hits,misses,evictions,dropped,len_trace,p50_ms,p99_ms"
+
+class SharedTrace:
+    """ Function-id and time arrays of one trace, copied into shared memory blocks by the parent """
+
+    def __init__(self, lambdas, funcs, func_ids, times):
+        self.lambdas = lambdas
+        self.funcs = funcs
+        self.n = len(func_ids)
+        self.blocks = []
+        self.names = []
+        for arr in (np.ascontiguousarray(func_ids, dtype=np.int32), np.ascontiguousarray(times, dtype=np.float64)):
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            self.blocks.append(shm)
+            self.names.append(shm.name)
+
+    def __getstate__(self):
+        # Workers only get the block names, never the arrays
+        state = self.__dict__.copy()
+        state["blocks"] = []
+        return state
+
+    def arrays(self):
+        """ Attach to the blocks (once per process) and return (func_ids, times) views """
+        if len(self.blocks) == 0:
+            self.blocks = [shared_memory.SharedMemory(name=name) for name in self.names]
+        func_ids = np.ndarray((self.n,), dtype=np.int32, buffer=self.blocks[0].buf)
+        times = np.ndarray((self.n,), dtype=np.float64, buffer=self.blocks[1].buf)
+        return func_ids, times
+
+    def release(self, unlink=False):
+        for shm in self.blocks:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        self.blocks = []
+
+def load_shared(num_functions, char, trace_path):
+    columnar = load_columnar_trace(num_functions, char, trace_path)
+    if columnar is not None:
+        lambdas, funcs, func_ids, times = columnar
+    else:
+        lambdas, trace = load_trace(num_functions, char, trace_path)
+        funcs, func_ids, times = to_columns(trace)
+    return SharedTrace(lambdas, funcs, func_ids, times)
+
+def summarize(policy, num_functions, mem, char, miss_stats, evdict, capacity_misses, len_trace, latency=None):
+    """ One results table row, cold % as `analyze_timings` computes it, latency percentiles if the result has them """
+    hits = sum(v["hits"] for v in miss_stats.values())
+    misses = sum(v["misses"] for v in miss_stats.values())
+    dropped = sum(capacity_misses.values())
+    cold_pct = misses / (hits + misses) * 100 if hits + misses > 0 else 0
+    dropped_pct = dropped / len_trace * 100 if len_trace > 0 else 0
+    p50 = p99 = float("nan")
+    if latency is not None:
+        h = LatencyHistogram.from_dict(latency)
+        p50, p99 = h.quantile(0.5), h.quantile(0.99)
+    return (policy, num_functions, mem, char, cold_pct, dropped_pct, hits, misses, sum(evdict.values()), dropped, len_trace, p50, p99)
+
+def summarize_file(save_pth, num_functions, mem, char):
+    with open(save_pth, "r+b") as f:
+        data = pickle.load(f)
+    policy, evdict, miss_stats, lambdas, capacity_misses, len_trace = data[:6]
+    latency = data[6] if len(data) > 6 else None
+    return summarize(policy, num_functions, mem, char, miss_stats, evdict, capacity_misses, len_trace, latency)
+
+############################################################
+
+_traces = dict()  # (numfuncs, char) : SharedTrace, set in every worker by `init_worker`
+_args = None
+
+def init_worker(traces, args):
+    global _traces, _args
+    _traces = traces
+    _args = args
+
+def finish_cell(L, policy, num_functions, char, mem, shared, start):
+    L.CloseLogs()
+    save_pth = os.path.join(_args.savedir, result_name(policy, num_functions, mem, char))
+    latency = L.latency_histogram().to_dict()
+    evdict, capacity_misses = L.kind_counts(L.evdict), L.kind_counts(L.capacity_misses)
+    save_result(save_pth, policy, evdict, L.miss_stats(), shared.lambdas, capacity_misses, shared.n, latency)
+    if L.Profiler is not None:
+        L.Profiler.save(profile_name(save_pth), L)
+    if L.Telemetry is not None:
+        L.Telemetry.save(profile_name(save_pth, ".telemetry.npz"), L)
+    print("done", os.path.basename(save_pth), "{:.1f}s".format(time.time() - start), flush=True)
+    return summarize(policy, num_functions, mem, char, L.miss_stats(), evdict, capacity_misses, shared.n, latency)
+
+def run_cell(job):
+    """ Run one (policy, numfuncs, char, mem) cell from the start, returning its table row """
+    policy, num_functions, char, mem = job
+    shared = _traces[(num_functions, char)]
+    func_ids, times = shared.arrays()
+
+    start = time.time()
+    L = make_scheduler(policy, num_functions, char, mem, _args)
+    L.runTrace(shared.funcs, func_ids, times)
+    return finish_cell(L, policy, num_functions, char, mem, shared, start)
+
+def fork_checkpointer(policy, num_functions, char, mem):
+    save_pth = os.path.join(_args.savedir, result_name(policy, num_functions, mem, char))
+    return Checkpointer(profile_name(save_pth, ".fork"))
+
+def run_prefix_cell(job):
+    """
+    Simulate the prefix of one cell for all of its policies and save a fork per policy.
+    Returns the cells that continue from those forks, for `run_fork`
+    """
+    policies, num_functions, char, mem = job
+    shared = _traces[(num_functions, char)]
+    func_ids, times = shared.arrays()
+
+    prefix = make_scheduler(policies[0], num_functions, char, mem, _args)
+    offset = run_prefix(prefix, policies, shared.funcs, func_ids, times)
+    print("prefix {}-{}-{}: {} of {} invocations".format(num_functions, char, mem, offset, shared.n), flush=True)
+    forks = []
+    for policy in policies:
+        # Saved with the `random` state at the fork, which the worker that continues it restores
+        fork_checkpointer(policy, num_functions, char, mem).save(prefix.fork(policy), offset)
+        forks.append((policy, num_functions, char, mem))
+    return forks
+
+def run_fork(job):
+    """ Continue one cell from the fork `run_prefix_cell` saved, returning its table row """
+    policy, num_functions, char, mem = job
+    shared = _traces[(num_functions, char)]
+    func_ids, times = shared.arrays()
+
+    start = time.time()
+    checkpointer = fork_checkpointer(policy, num_functions, char, mem)
+    L, offset = checkpointer.load()
+    L.runTrace(shared.funcs, func_ids, times, start=offset)
+    row = finish_cell(L, policy, num_functions, char, mem, shared, start)
+    checkpointer.remove()
+    return row
+
+def run_grid(args):
+    cells = [(policy, num_functions, char, int(mem))
+             for policy in args.policy for num_functions in args.numfuncs
+             for char in args.char for mem in args.mem]
+    rows = dict()
+    jobs = []
+    for cell in cells:
+        policy, num_functions, char, mem = cell
+        save_pth = os.path.join(args.savedir, result_name(policy, num_functions, mem, char))
+        if os.path.exists(save_pth):
+            rows[cell] = summarize_file(save_pth, num_functions, mem, char)
+        else:
+            jobs.append(cell)
+    print("{} cells, {} already done, {} to run".format(len(cells), len(cells) - len(jobs), len(jobs)))
+
+    if len(jobs) > 0:
+        prefixes = []   # (policies, numfuncs, char, mem) of cells whose policies share a prefix
+        if args.fork:
+            grouped = dict()
+            single = []
+            for policy, num_functions, char, mem in jobs:
+                if forkable(policy):
+                    grouped.setdefault((num_functions, char, mem), []).append(policy)
+                else:
+                    single.append((policy, num_functions, char, mem))
+            for key, policies in grouped.items():
+                if len(policies) > 1:
+                    prefixes.append((tuple(policies),) + key)
+                else:
+                    single.append((policies[0],) + key)
+            jobs = single
+
+        traces = dict()
+        for key in sorted(set((num_functions, char) for policy, num_functions, char, mem in jobs + prefixes)):
+            traces[key] = load_shared(key[0], key[1], args.tracedir)
+        try:
+            # Longest first: longer traces, then larger pools
+            longest = lambda j: (traces[(j[1], j[2])].n, j[3])
+            jobs.sort(key=longest, reverse=True)
+            prefixes.sort(key=longest, reverse=True)
+            with mp.Pool(args.workers, initializer=init_worker, initargs=(traces, args)) as pool:
+                # Prefixes are queued first, each one unlocks the forks of its cell
+                forked = pool.imap_unordered(run_prefix_cell, prefixes)
+                pending = [(job, pool.apply_async(run_cell, (job,))) for job in jobs]
+                for forks in forked:
+                    pending += [(job, pool.apply_async(run_fork, (job,))) for job in forks]
+                for job, result in pending:
+                    rows[job] = result.get()
+        finally:
+            for shared in traces.values():
+                shared.release(unlink=True)
+
+    with open(args.table, "w") as f:
+        f.write(TABLE_HEADER + "\n")
+        for cell in cells:
+            f.write(",".join(str(x) for x in rows[cell]) + "\n")
+    print("wrote", args.table)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a grid of FaasCache simulations')
+    parser.add_argument("--tracedir", type=str, default="../traces/", required=False)
+    parser.add_argument("--numfuncs", type=int, required=True, action='append')
+    parser.add_argument("--char", type=str, required=True, action='append')
+    parser.add_argument("--policy", type=str, required=True, action='append')
+    parser.add_argument("--mem", required=True, action='append')
+    parser.add_argument("--savedir", type=str, default="/data/alfuerst/verify-test/", required=False)
+    parser.add_argument("--logdir", type=str, default="/data/alfuerst/verify-test/logs/", required=False)
+    parser.add_argument("--table", type=str, default=None, required=False, help="defaults to <savedir>/results.csv")
+    parser.add_argument("--workers", type=int, default=None, required=False)
+    parser.add_argument("--validate", type=str, default="off", choices=["off", "sampled", "full"], required=False)
+    parser.add_argument("--validate_every", type=int, default=1000, required=False)
+    parser.add_argument("--eventlog", action="store_true", help="write a binary per-event log to --logdir")
+    parser.add_argument("--profile", action="store_true", help="time the scheduler's phases, saved as <result>.profile.json")
+    parser.add_argument("--telemetry", type=float, default=None, required=False,
+                        help="sample pool size, memory, evictions and cold starts every this many ms of simulated time, saved as <result>.telemetry.npz")
+    parser.add_argument("--ttl", type=float, default=None, required=False,
+                        help="keep-alive TTL in ms of the TTL_* policies, inf never expires")
+    parser.add_argument("--fork", action="store_true", help="simulate the eviction-free prefix once per cell and fork it into each policy")
+
+    args = parser.parse_args()
+    if args.fork and args.eventlog:
+        parser.error("--fork cannot be combined with --eventlog")
+    if args.validate_every < 1:
+        parser.error("--validate_every must be at least 1")
+    if args.telemetry is not None and not args.telemetry > 0:
+        parser.error("--telemetry must be positive")
+    if args.table is None:
+        args.table = os.path.join(args.savedir, "results.csv")
+    if not os.path.exists(args.savedir):
+        os.makedirs(args.savedir)
+    if not os.path.exists(args.logdir):
+        os.makedirs(args.logdir)
+
+    print(args)
+    run_grid(args)
@@ -0,0 +1,69 @@
+"""
+Fixed-interval time series of a simulation, in simulated time.
+
+`LambdaScheduler.runInvocation` compares each invocation's time with `next_sample`; only when it crosses an
+interval boundary does `Telemetry.sample` run, once per boundary crossed. Each sample holds the pool gauges at
+the boundary and the evictions, cold starts, warm starts, drops and keep-alive expiries during the interval that just ended.
+Rows go into preallocated arrays, grown by doubling if the trace runs past the expected number of intervals,
+so memory is bounded by the number of intervals, not the number of invocations.
+"""
+import numpy as np
+
+# (field, dtype) of every sample
+FIELDS = [("time", np.float64), ("mem_used", np.float64), ("pool", np.int64), ("running", np.int64),
+          ("evictions", np.int64), ("misses", np.int64), ("hits", np.int64), ("dropped", np.int64),
+          ("expired", np.int64)]
+
+class Telemetry:
+
+    def __init__(self, interval, num_intervals:int=1024):
+        if not interval > 0:
+            raise ValueError("Telemetry interval must be positive: {}".format(interval))
+        self.interval = interval
+        self.next_sample = float("-inf")    # first invocation sets the origin
+        self.n = 0
+        self.data = {name: np.zeros(max(1, num_intervals), dtype=dtype) for name, dtype in FIELDS}
+        self.last = None                    # cumulative counters at the previous sample
+
+    def counters(self, sched):
+        misses = sum(sched.misses)
+        return (sum(sched.evdict), misses, sched.num_invocations - misses, sum(sched.capacity_misses), sum(sched.expired))
+
+    def append(self, sched, t):
+        if self.n == len(self.data["time"]):
+            for name, dtype in FIELDS:
+                self.data[name] = np.concatenate((self.data[name], np.zeros(self.n, dtype=dtype)))
+        now = self.counters(sched)
+        row = (t, sched.mem_used, len(sched.ContainerPool), len(sched.RunningC)) + tuple(a - b for a, b in zip(now, self.last))
+        for (name, dtype), value in zip(FIELDS, row):
+            self.data[name][self.n] = value
+        self.n += 1
+        self.last = now
+
+    def sample(self, sched, t):
+        """ Record every interval boundary up to invocation time `t`, called by `runInvocation` before it runs """
+        if self.last is None:
+            self.last = self.counters(sched)
+            self.next_sample = (t // self.interval + 1) * self.interval
+            return
+        wall_time = sched.wall_time
+        while self.next_sample <= t:
+            # Complete what finished by the boundary, as the next invocation would have
+            sched.wall_time = self.next_sample
+            sched.cleanup_finished()
+            self.append(sched, self.next_sample)
+            self.next_sample += self.interval
+        sched.wall_time = wall_time
+
+    def arrays(self, sched=None):
+        """ The recorded series, plus a final partial interval up to the last invocation if `sched` is given """
+        n, last = self.n, self.last
+        if sched is not None and last is not None:
+            self.append(sched, sched.wall_time)
+            # The partial row is not kept, the run may continue
+            self.n, self.last = n, last
+            n += 1
+        return {name: self.data[name][:n] for name, dtype in FIELDS}
+
+    def save(self, path, sched):
+        np.savez_compressed(path, interval=self.interval, **self.arrays(sched))
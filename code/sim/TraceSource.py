@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""
+Chunked trace sources, for replaying traces that do not fit in memory.
+
+Both sources yield the trace as lists of (LambdaData, time) of at most `chunk` invocations, starting at a given
+invocation offset, for `LambdaScheduler.runChunks`:
+  columnar_chunks - slices of a (memory-mapped) columnar trace, see ColumnarTrace.py
+  ShardedTrace    - one time-sorted shard per function, merged lazily with `heapq.merge`
+
+A sharded trace `<num_functions>-<char>.shards/` holds
+  functions.pckl - (lambdas, funcs) as in a columnar trace
+  <func_id>.npy  - SHARD_DTYPE records of that function's invocations, sorted by time
+`seq` is the invocation's position in the merged trace. It breaks ties between equal times and is the offset
+used to resume, so shards cut from an existing trace replay it in exactly the original order.
+Shards are read a block at a time, opening the file for each read, so replaying a trace with thousands of
+functions holds no file descriptors between reads.
+"""
+import argparse
+import heapq
+import os
+import pickle
+import numpy as np
+from LambdaData import *
+from FunctionTable import *
+from ColumnarTrace import load_columnar, to_columns, save_functions
+
+SHARD_DTYPE = np.dtype([("time", np.float64), ("seq", np.int64)])
+
+def shards_name(num_functions, char):
+    return "{}-{}.shards".format(num_functions, char)
+
+def shard_header(path):
+    """ (number of records, byte offset of the first one) of a shard file """
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        if dtype != SHARD_DTYPE:
+            raise Exception("Shard {} has dtype {}, expected {}".format(path, dtype, SHARD_DTYPE))
+        return shape[0], f.tell()
+
+def columnar_chunks(funcs, func_ids, times, start:int=0, chunk:int=65536):
+    for pos in range(start, len(func_ids), chunk):
+        ids = func_ids[pos:pos+chunk].tolist()
+        ts = times[pos:pos+chunk].tolist()
+        yield [(funcs[fid], t) for fid, t in zip(ids, ts)]
+
+def save_shards(out_dir, lambdas, funcs, func_ids, times):
+    """ Split a columnar trace into per-function shards """
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    order = np.argsort(func_ids, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(func_ids, minlength=len(funcs)))))
+    for fid in range(len(funcs)):
+        idx = order[bounds[fid]:bounds[fid+1]]
+        shard = np.empty(len(idx), dtype=SHARD_DTYPE)
+        shard["time"] = times[idx]
+        shard["seq"] = idx
+        np.save(os.path.join(out_dir, "{}.npy".format(fid)), shard)
+    # Written last, a directory without it is an interrupted conversion
+    save_functions(out_dir, lambdas, funcs)
+
+class ShardedTrace:
+
+    def __init__(self, trace_dir):
+        with open(os.path.join(trace_dir, "functions.pckl"), "r+b") as f:
+            self.lambdas, funcs = pickle.load(f)
+        self.funcs = FunctionTable.from_funcs(funcs).funcs
+        self.paths = [os.path.join(trace_dir, "{}.npy".format(fid)) for fid in range(len(self.funcs))]
+        self.shards = [shard_header(path) for path in self.paths]  # (records, data offset) per function
+
+    @classmethod
+    def open(cls, trace_dir):
+        """ The sharded trace in `trace_dir`, or None if there is no complete one """
+        if not os.path.exists(os.path.join(trace_dir, "functions.pckl")):
+            return None
+        return cls(trace_dir)
+
+    def __len__(self):
+        return sum(n for n, offset in self.shards)
+
+    def read(self, fid, pos, count):
+        """ Records `pos` to `pos+count` of one shard, the file is only open during the read """
+        n, offset = self.shards[fid]
+        with open(self.paths[fid], "rb") as f:
+            f.seek(offset + pos * SHARD_DTYPE.itemsize)
+            return np.fromfile(f, dtype=SHARD_DTYPE, count=max(0, min(count, n - pos)))
+
+    def seek(self, fid, start):
+        """ Position in one shard of its first invocation at or after offset `start`, by binary search """
+        lo, hi = 0, self.shards[fid][0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.read(fid, mid, 1)["seq"][0] < start:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def stream(self, fid, start, block):
+        """ (time, seq, fid) of one shard from offset `start` on, read `block` records at a time """
+        n, offset = self.shards[fid]
+        pos = self.seek(fid, start) if start > 0 else 0
+        for pos in range(pos, n, block):
+            part = self.read(fid, pos, block)
+            for t, seq in zip(part["time"].tolist(), part["seq"].tolist()):
+                yield t, seq, fid
+
+    def chunks(self, start:int=0, chunk:int=65536, block:int=4096):
+        """
+        Merge the shards lazily, holding at most `block` records per shard and one chunk in memory.
+        Every shard's stream is started at once, which is why they do not keep their files open
+        """
+        funcs = self.funcs
+        merged = heapq.merge(*[self.stream(fid, start, block) for fid in range(len(funcs))])
+        out = []
+        for t, seq, fid in merged:
+            out.append((funcs[fid], t))
+            if len(out) == chunk:
+                yield out
+                out = []
+        if len(out) > 0:
+            yield out
+
+def convert(trace_path, out_dir):
+    """ Shard a columnar `.trace` directory or a `.pckl` trace """
+    columnar = load_columnar(trace_path)
+    if columnar is not None:
+        lambdas, funcs, func_ids, times = columnar
+    else:
+        with open(trace_path, "r+b") as f:
+            lambdas, trace = pickle.load(f)
+        funcs, func_ids, times = to_columns(trace)
+    save_shards(out_dir, lambdas, funcs, func_ids, times)
+    return len(func_ids)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Split FaasCache traces into per-function shards')
+    parser.add_argument("--tracedir", type=str, default="../traces/", required=False)
+    parser.add_argument("--outdir", type=str, default=None, required=False, help="defaults to --tracedir")
+    parser.add_argument("--force", action="store_true", help="re-shard traces that already have a sharded copy")
+    args = parser.parse_args()
+    outdir = args.outdir if args.outdir is not None else args.tracedir
+
+    for file in sorted(os.listdir(args.tracedir)):
+        if file.endswith(".trace"):
+            name = file[:-len(".trace")]
+        elif file.endswith(".pckl"):
+            name = file[:-len(".pckl")]
+        else:
+            continue
+        out_dir = os.path.join(outdir, name + ".shards")
+        if os.path.exists(os.path.join(out_dir, "functions.pckl")) and not args.force:
+            print("exists", out_dir)
+            continue
+        n = convert(os.path.join(args.tracedir, file), out_dir)
+        print("sharded", file, n, "invocations")
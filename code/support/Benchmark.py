@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+"""
+Throughput benchmark of `LambdaScheduler` for every registered eviction policy.
+
+Synthetic traces of every `--invocations` x `--numfuncs` size are generated with `TraceGen.SyntheticTrace` and
+cached as columnar traces in `--tracedir`, so runs on different commits replay the same invocations.
+Each policy then runs in a fresh process, reporting invocations per second, peak RSS and the mean latency
+of an eviction, one CSV row per run. `--compare old.csv` prints the throughput change against an earlier run.
+"""
+import os
+import sys
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../sim"))
+
+import argparse
+import multiprocessing as mp
+import resource
+import subprocess
+from TraceGen import SyntheticTrace
+from LambdaScheduler import LambdaScheduler
+from EvictionPolicy import POLICIES
+from ColumnarTrace import save_columnar, load_columnar
+from Profiler import Profiler
+
+BENCH_HEADER = "commit,policy,numfuncs,invocations,mem,run_secs,inv_per_sec,peak_rss_mb,evict_calls,evicted,evict_us,select_us"
+
+def bench_trace(num_funcs, n, seed, trace_dir):
+    """ Path of the columnar synthetic trace for `num_funcs` x `n`, generating it on first use """
+    path = os.path.join(trace_dir, "bench-{}-{}-{}.trace".format(num_funcs, n, seed))
+    if load_columnar(path) is None:
+        lambdas, funcs, func_ids, times = SyntheticTrace(num_funcs, seed).gen_columns(n, seed)
+        save_columnar(path, lambdas, funcs, func_ids, times)
+    return path
+
+def bench_mem(trace_path, mem_frac):
+    """ Pool size that fits `mem_frac` of one container of every function in the trace """
+    lambdas, funcs, func_ids, times = load_columnar(trace_path)
+    return max(int(mem_frac * sum(d.mem_size for d in funcs)), max(d.mem_size for d in funcs))
+
+def run_case(case):
+    """ Run one policy over one trace, in a process of its own so ru_maxrss is that run's peak """
+    commit, policy, num_funcs, n, mem, trace_path = case
+    lambdas, funcs, func_ids, times = load_columnar(trace_path)
+    L = LambdaScheduler(policy, mem, num_funcs, "bench", "", validate="off")
+    # Only evictions are timed, they are rare enough not to slow the run down
+    L.Profiler = Profiler()
+    L.Profiler.attach(L, phases=["Eviction"])
+    L.runTrace(funcs, func_ids, times)
+
+    prof = L.Profiler
+    run_secs = prof.times["runTrace"]
+    evict_calls = prof.calls["Eviction"]
+    evict_us = prof.times["Eviction"] / evict_calls * 1e6 if evict_calls > 0 else 0
+    select_us = prof.times["EvictionFunc"] / evict_calls * 1e6 if evict_calls > 0 else 0
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return (commit, policy, num_funcs, n, mem, run_secs, len(func_ids) / run_secs, peak_rss_mb,
+            evict_calls, sum(L.evdict), evict_us, select_us)
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def read_table(path):
+    """ (policy, numfuncs, invocations) : inv_per_sec from a benchmark CSV """
+    out = dict()
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+        for line in f:
+            row = dict(zip(header, line.strip().split(",")))
+            out[(row["policy"], int(row["numfuncs"]), int(row["invocations"]))] = float(row["inv_per_sec"])
+    return out
+
+def compare(old_path, rows):
+    old = read_table(old_path)
+    for row in rows:
+        key = (row[1], row[2], row[3])
+        if key in old:
+            print("{:<32} {:>5} funcs {:>9} inv: {:>10.0f} -> {:>10.0f} inv/s ({:+.1f}%)".format(
+                key[0], key[1], key[2], old[key], row[6], (row[6] / old[key] - 1) * 100))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark FaasCache scheduler throughput')
+    parser.add_argument("--invocations", type=int, action='append', default=None,
+                        help="trace lengths, default 10k 100k 1M 10M")
+    parser.add_argument("--numfuncs", type=int, action='append', default=None, help="functions per trace, default 20 100 1000")
+    parser.add_argument("--policy", type=str, action='append', default=None, help="default every registered policy")
+    parser.add_argument("--mem_frac", type=float, default=0.25, required=False,
+                        help="pool size as a fraction of the memory of one container per function")
+    parser.add_argument("--seed", type=int, default=0, required=False)
+    parser.add_argument("--tracedir", type=str, default="/tmp/faascache-bench/", required=False)
+    parser.add_argument("--out", type=str, default="benchmark.csv", required=False)
+    parser.add_argument("--compare", type=str, default=None, required=False, help="earlier benchmark CSV to compare against")
+
+    args = parser.parse_args()
+    sizes = args.invocations or [10000, 100000, 1000000, 10000000]
+    num_funcs = args.numfuncs or [20, 100, 1000]
+    policies = args.policy or sorted(POLICIES)
+    if not os.path.exists(args.tracedir):
+        os.makedirs(args.tracedir)
+
+    commit = git_commit()
+    cases = []
+    for nf in num_funcs:
+        for n in sizes:
+            trace_path = bench_trace(nf, n, args.seed, args.tracedir)
+            mem = bench_mem(trace_path, args.mem_frac)
+            cases += [(commit, policy, nf, n, mem, trace_path) for policy in policies]
+
+    rows = []
+    # Runs one at a time so they do not compete for cores or memory bandwidth
+    with mp.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for row in pool.imap(run_case, cases):
+            rows.append(row)
+            print("{:<32} {:>5} funcs {:>9} inv: {:>10.0f} inv/s, {:.0f} MB, {:.1f} us/eviction".format(
+                row[1], row[2], row[3], row[6], row[7], row[10]), flush=True)
+
+    with open(args.out, "w") as f:
+        f.write(BENCH_HEADER + "\n")
+        for row in rows:
+            f.write(",".join(str(x) for x in row) + "\n")
+    print("wrote", args.out)
+    if args.compare is not None:
+        compare(args.compare, rows)
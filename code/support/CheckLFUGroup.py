@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+"""
+Regression check of the LFU_GROUP_* policies against their original list-based implementations.
+
+`LFUGroupEngine` replaced eviction functions that sorted `ContainerPool` on every eviction; the reference
+versions below are those functions, kept as they were. Every policy runs over tie-heavy synthetic traces
+(few distinct sizes, init times and frequencies) twice, once with its engine and once with the reference
+function as `EvictionFunc`, and the evictions, hits, misses and drops of the two runs must match.
+Every cell is checked, and the script exits non-zero if any of them differ.
+"""
+import os
+import sys
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../sim"))
+
+import argparse
+import random
+from LambdaScheduler import LambdaScheduler
+from LambdaData import LambdaData
+
+############################################################
+# Original implementations, `sched` in place of `self`
+
+def binary_search_closest(arr, key):
+    start = 0
+    end = len(arr) - 1
+    while start < end:
+        mid = start + (end - start) // 2
+        if key > arr[mid].metadata.mem_size:
+            start = mid + 1
+        else:
+            end = mid
+    return end
+
+def find_closest_group(arr, key, group_size):
+    if group_size >= len(arr):
+        return arr
+    victim_group_start = binary_search_closest(arr, key)
+    victim_group_start = min(victim_group_start, len(arr) - group_size)
+    return arr[victim_group_start:]
+
+def init_time(c):
+    return c.metadata.run_time - c.metadata.warm_time
+
+def available_by_freq(sched):
+    available = [c for c in sched.ContainerPool if c not in sched.RunningC]
+    # Ascending invoke_freq, least invoked is at the start
+    available.sort(key=lambda c: c.invoke_freq)
+    return available
+
+def evict_lfu_group_closest(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    group_size = int(0.1 * len(available)) if len(available) > 40 else 4
+    while to_free > 0 and len(available) > 0:
+        available_group = available[:group_size]
+        victim = available_group[binary_search_closest(available_group, to_free)]
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+def evict_lfu_group_maxcoldtime(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    group_size = int(0.1 * len(available)) if len(available) > 40 else 4
+    while to_free > 0 and len(available) > 0:
+        available_group = available[:group_size]
+        available_group.sort(key=lambda c: c.metadata.run_time)
+        victim = available_group.pop()
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+def evict_lfu_group_maxinittime(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    group_size = int(0.1 * len(available)) if len(available) > 40 else 4
+    while to_free > 0 and len(available) > 0:
+        lfu_group = available[:group_size]
+        lfu_group.sort(key=init_time)
+        victim = lfu_group[0]
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+def evict_lfu_group_maxinitgroup_closest(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    lfu_group_size = int(0.1 * len(available)) if len(available) > 40 else 4
+    maxinit_group_size = int(0.05 * len(available)) if len(available) > 40 else 2
+    while to_free > 0 and len(available) > 0:
+        lfu_group = available[:lfu_group_size]
+        lfu_group.sort(key=init_time)
+        maxinit_group = lfu_group[:maxinit_group_size]
+        maxinit_group.sort(key=lambda c: c.metadata.mem_size)
+        victim = maxinit_group[binary_search_closest(maxinit_group, to_free)]
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+def evict_lfu_group_closestgroup_maxinit(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    lfu_group_size = int(0.1 * len(available)) if len(available) > 60 else 6
+    closest_group_size = int(0.05 * len(available)) if len(available) > 60 else 3
+    while to_free > 0 and len(available) > 0:
+        lfu_group = available[:lfu_group_size]
+        lfu_group.sort(key=lambda c: c.metadata.mem_size)
+        closest_group = find_closest_group(lfu_group, to_free, closest_group_size)
+        closest_group.sort(key=init_time)
+        victim = closest_group[0]
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+def evict_lfu_group_maxinitgroup_largest(sched, to_free):
+    eviction_list = []
+    available = available_by_freq(sched)
+    lfu_group_size = int(0.1 * len(available)) if len(available) > 40 else 4
+    maxinit_group_size = int(0.05 * len(available)) if len(available) > 40 else 2
+    while to_free > 0 and len(available) > 0:
+        lfu_group = available[:lfu_group_size]
+        lfu_group.sort(key=init_time)
+        maxinit_group = lfu_group[:maxinit_group_size]
+        maxinit_group.sort(key=lambda c: c.metadata.mem_size)
+        victim = maxinit_group[-1]
+        available.remove(victim)
+        eviction_list.append(victim)
+        to_free -= victim.metadata.mem_size
+    return eviction_list
+
+REFERENCE = {
+    "LFU_GROUP_CLOSEST": evict_lfu_group_closest,
+    "LFU_GROUP_MAX_COLD_TIME": evict_lfu_group_maxcoldtime,
+    "LFU_GROUP_MAX_INIT_TIME": evict_lfu_group_maxinittime,
+    "LFUGROUP_MAXINITGROUP_CLOSEST": evict_lfu_group_maxinitgroup_closest,
+    "LFUGROUP_CLOSESTGROUP_MAXINIT": evict_lfu_group_closestgroup_maxinit,
+    "LFUGROUP_MAXINITGROUP_LARGEST": evict_lfu_group_maxinitgroup_largest,
+}
+
+############################################################
+
+def tie_trace(num_funcs, n, seed):
+    """ Synthetic trace where many functions share sizes, run times and warm times """
+    rng = random.Random(seed)
+    funcs = []
+    for i in range(num_funcs):
+        run = rng.choice([500, 3000])
+        funcs.append(LambdaData("f{}".format(i), rng.choice([64, 128, 256]), run, rng.choice([run // 2, run // 5])))
+    trace = []
+    t = 0
+    for _ in range(n):
+        t += rng.choice([0, 0, 1, 10, 50])
+        trace.append((funcs[min(int(rng.paretovariate(0.8)) - 1, num_funcs - 1)] if rng.random() < .6 else rng.choice(funcs), t))
+    return funcs, trace
+
+def run(policy, mem, num_funcs, trace, reference):
+    L = LambdaScheduler(policy, mem, num_funcs, "check", "", validate="off")
+    if reference:
+        L.EvictionFunc = lambda to_free: REFERENCE[policy](L, to_free)
+    for d, t in trace:
+        L.runInvocation(d, t)
+    return L.kind_counts(L.evdict), L.miss_stats(), L.kind_counts(L.capacity_misses)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check the LFU_GROUP policies against their original implementations')
+    parser.add_argument("--numfuncs", type=int, action='append', default=None, help="default 50 200")
+    parser.add_argument("--mem", type=int, action='append', default=None, help="default 1000 3000 8000 20000")
+    parser.add_argument("--invocations", type=int, default=20000, required=False)
+    parser.add_argument("--seeds", type=int, default=2, required=False)
+    args = parser.parse_args()
+
+    failed = 0
+    cells = 0
+    for num_funcs in args.numfuncs or [50, 200]:
+        for seed in range(args.seeds):
+            funcs, trace = tie_trace(num_funcs, args.invocations, seed)
+            for mem in args.mem or [1000, 3000, 8000, 20000]:
+                for policy in REFERENCE:
+                    cells += 1
+                    engine = run(policy, mem, num_funcs, trace, False)
+                    reference = run(policy, mem, num_funcs, trace, True)
+                    if engine != reference:
+                        failed += 1
+                        print("MISMATCH {} {} funcs seed {} mem {}: {} vs {} evictions".format(
+                            policy, num_funcs, seed, mem, sum(engine[0].values()), sum(reference[0].values())), flush=True)
+    print("{} of {} cells match".format(cells - failed, cells))
+    sys.exit(1 if failed > 0 else 0)
@@ -3,12 +3,15 @@ sys.path.insert(1, '../sim')
 
 from Container import *
 from LambdaData import *
+from FunctionTable import *
+from ColumnarTrace import save_columnar
 import pandas as pd
 import numpy as np
 from random import choice
 import  os
 from math import ceil
 import random, pickle
+import argparse
 
 class LambdaTrace:
     kinds = ['a','b','c','d']
@@ -40,20 +43,32 @@ class LambdaTrace:
         recipsum = sum(reciprocal_iat)
         return reciprocal_iat/recipsum
     
+    def gen_columns(self, n, sample_seed=0):
+        """
+        Generate about `n` invocations as columnar arrays (lambdas, funcs, func_ids, times), see ColumnarTrace.py.
+        Each function gets a Poisson stream: its exponential inter-arrival times are drawn in bulk, truncated to
+        whole ms and summed. The streams are merged with a stable sort, ties keep function order.
+        The same `sample_seed` always gives the same trace.
+        """
+        rng = np.random.default_rng(sample_seed)
+        funcs = FunctionTable.from_funcs(self.lam_datas).funcs
+        ids = []
+        times = []
+        for i,d in enumerate(funcs):
+            count = int(self.frac_iat[i]*n)
+            iats = rng.exponential(self.iat[i], size=count).astype(np.int64)
+            times.append(np.cumsum(iats))
+            ids.append(np.full(count, d.func_id, dtype=np.int32))
+        times = np.concatenate(times)
+        # Concatenated sorted runs, which the stable sort merges instead of sorting from scratch
+        order = np.argsort(times, kind="stable")
+        return self.lambdas, funcs, np.concatenate(ids)[order], times[order].astype(np.float64)
+
     def gen_full_trace(self, n, sample_seed=0):
         #n: number of entries to generate
-        trace = []
-        self.curr_time = 0 
-        
-        for i,d in enumerate(self.lam_datas):
-            t = 0 
-            for _ in range(int(self.frac_iat[i]*n)):
-                next_iat_ms = int(np.random.exponential(self.iat[i]))
-                t = t + next_iat_ms
-                trace.append((d, t))
-        
-        out_trace = sorted(trace, key=lambda x:x[1]) #(lamdata, t)
-        return self.lambdas, out_trace 
+        lambdas, funcs, func_ids, times = self.gen_columns(n, sample_seed)
+        out_trace = [(funcs[fid], t) for fid, t in zip(func_ids.tolist(), times.astype(np.int64).tolist())] #(lamdata, t)
+        return lambdas, out_trace 
 
 class PlannedTrace (LambdaTrace):
     kinds = ['smol','lorge']
@@ -89,16 +104,35 @@ class PlannedTrace (LambdaTrace):
     def gen_trace_entry(self):
         pass
     
-    def gen_full_trace(self, n, sample_seed=0) :
-        #n: number of entries to generate
-        trace = []
-        self.curr_time = 0 
-        
-        for i,d in enumerate(self.lam_datas):
-            t = 0 
-            for _ in range(int(self.frac_iat[i]*n)):
-                next_iat_ms = int(np.random.exponential(self.iat[i]))
-                t = t + next_iat_ms
-                trace.append((d, t))
-        out_trace = sorted(trace, key=lambda x:x[1]) #(lamdata, t)
-        return self.lambdas, out_trace 
+    # gen_columns and gen_full_trace are inherited from LambdaTrace
+
+class SyntheticTrace (LambdaTrace):
+    """
+    `num_funcs` functions with sizes and run times drawn from the `LambdaTrace` kinds.
+    Function i has a mean inter-arrival time of (i+1) * `base_iat`, so popularity falls off as 1/(i+1)
+    """
+
+    def __init__(self, num_funcs, seed=0, base_iat=50):
+        rng = np.random.default_rng(seed)
+        picks = rng.integers(len(LambdaTrace.kinds), size=num_funcs)
+        self.kinds = ["f{}".format(i) for i in range(num_funcs)]
+        self.mem_sizes = [LambdaTrace.mem_sizes[p] for p in picks]
+        self.run_times = [LambdaTrace.run_times[p] for p in picks]
+        self.warm_times = [LambdaTrace.warm_times[p] for p in picks]
+        self.workload_mix = [1] * num_funcs
+        self.iat = [base_iat * (i+1) for i in range(num_funcs)]
+        super().__init__()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic columnar trace')
+    parser.add_argument("--numfuncs", type=int, default=None, required=False,
+                        help="SyntheticTrace with this many functions, default the four LambdaTrace kinds")
+    parser.add_argument("--invocations", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0, required=False)
+    parser.add_argument("--out", type=str, required=True, help="columnar trace directory to write")
+    args = parser.parse_args()
+
+    gen = LambdaTrace() if args.numfuncs is None else SyntheticTrace(args.numfuncs, args.seed)
+    lambdas, funcs, func_ids, times = gen.gen_columns(args.invocations, args.seed)
+    save_columnar(args.out, lambdas, funcs, func_ids, times)
+    print("wrote", len(func_ids), "invocations of", len(funcs), "functions to", args.out)